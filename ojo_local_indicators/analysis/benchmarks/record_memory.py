@@ -0,0 +1,61 @@
+# ---
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: -all
+#     comment_magics: true
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#       jupytext_version: 1.13.2
+#   kernelspec:
+#     display_name: ojo_local_indicators
+#     language: python
+#     name: ojo_local_indicators
+# ---
+
+# %% [markdown]
+# ### Memory per advert: raw OJO dictionaries vs compact job ad records
+
+# %%
+import gc
+import json
+import tracemalloc
+
+import ojo_local_indicators
+import ojo_local_indicators.getters.open_data as od
+import ojo_local_indicators.pipeline.records as rc
+
+# %%
+# Set directory
+project_directory = ojo_local_indicators.PROJECT_DIR
+
+# %%
+# Raw JSON text of the UK sample (so both measures start from the same text)
+with open(f"{project_directory}/outputs/data/{od.uk_sample_file}") as json_file:
+    raw_text = json_file.read()
+
+
+# %%
+def traced_bytes(load):
+    """Bytes still allocated after running load (while its result is kept)."""
+    gc.collect()
+    tracemalloc.start()
+    result = load()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+# %%
+raw_ads, raw_bytes = traced_bytes(lambda: json.loads(raw_text))
+n_ads = len(raw_ads)
+del raw_ads
+job_ads, record_bytes = traced_bytes(lambda: rc.to_job_ads(json.loads(raw_text)))
+
+# %%
+print("Adverts:", n_ads)
+print("Raw dictionaries (bytes per advert):", round(raw_bytes / n_ads))
+print("Job ad records (bytes per advert):", round(record_bytes / n_ads))
+print("Reduction:", round(raw_bytes / record_bytes, 1), "x")
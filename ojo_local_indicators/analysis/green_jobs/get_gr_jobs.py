@@ -19,6 +19,7 @@ import nltk
 
 nltk.download("wordnet")
 from grjobs.pipeline.green_classifier import load_model
+from ojo_local_indicators.getters.stream_data import iter_batches
 import json
 import numpy as np
 import pandas as pd
@@ -41,6 +42,21 @@ def save_raw_jobs(job_ad, file_path):
         json.dump(job_ad, file)
 
 
+# %%
+def save_raw_jobs_batches(batches, file_path):
+    """Writes batches of adverts to one JSON array, one batch at a time."""
+    with open(file_path, "w") as file:
+        file.write("[")
+        first = True
+        for batch in batches:
+            for job_ad in batch:
+                if not first:
+                    file.write(", ")
+                json.dump(job_ad, file)
+                first = False
+        file.write("]")
+
+
 # %%
 def label_green(raw_ads):
     green_pred = model.predict(raw_ads)
@@ -52,15 +68,14 @@ def label_green(raw_ads):
 
 
 # %%
-uk_jds = open_raw_jobs(
-    "../../../outputs/data/job_descriptions/uk_sample_07-06-2021_22-11-2021.json"
+# Label and save in batches so memory does not grow with the size of the file
+uk_jds = iter_batches(
+    "../../../outputs/data/job_descriptions/uk_sample_07-06-2021_22-11-2021.json",
+    batch_size=10000,
 )
 
 # %%
-gr_uk_jds = label_green(uk_jds)
-
-# %%
-gr_uk_jds[0]
+gr_uk_jds = (label_green(batch) for batch in uk_jds)
 
 # %%
-save_raw_jobs(gr_uk_jds, "../../../outputs/data/green_jobs_uk_sample.json")
+save_raw_jobs_batches(gr_uk_jds, "../../../outputs/data/green_jobs_uk_sample.json")
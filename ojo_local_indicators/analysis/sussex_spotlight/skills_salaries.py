@@ -23,6 +23,7 @@
 import ojo_local_indicators
 import ojo_local_indicators.getters.open_data as od
 import ojo_local_indicators.pipeline.sussex_spotlight as ss
+import ojo_local_indicators.pipeline.flatten_data as fd
 import pandas as pd
 
 # from collections import Counter
@@ -39,10 +40,18 @@ project_directory = ojo_local_indicators.PROJECT_DIR
 sussex = od.sussex
 
 # %%
-# Calling skills functions to create skills % df from Sussex dictionary
+# Calling skills functions to create skills % df from the flattened Sussex skills table
+sussex_file = f"{project_directory}/outputs/data/{od.sussex_file}"
+df_sussex = ss.skills_table_df(
+    fd.read_table(sussex_file, "skills", ["advert_id", "label_cluster_2"]),
+    len(sussex),
+    "label_cluster_2",
+)
+
+# %%
+# Skills per advert (for the salary dfs)
 sussex_skills = ss.get_skills(sussex)
 cluster_2 = ss.skill_count(sussex_skills, "label_cluster_2")
-df_sussex = ss.locations_skills_df(sussex, cluster_2)
 
 # %% [markdown]
 # ### What salaries are associated with the largest (or fastest-growing) skill groups in Sussex?
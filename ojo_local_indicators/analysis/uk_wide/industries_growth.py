@@ -29,6 +29,8 @@ from ojd_daps.dqa.data_getters import get_valid_cache_dates
 
 import ojo_local_indicators
 import ojo_local_indicators.pipeline.clean_data as cd
+import ojo_local_indicators.pipeline.count_cube as cc
+import ojo_local_indicators.pipeline.growth as gr
 import ojo_local_indicators.pipeline.uk_wide as uw
 
 import matplotlib.pyplot as plt
@@ -42,48 +44,26 @@ import seaborn as sns
 project_directory = ojo_local_indicators.PROJECT_DIR
 
 # %%
-# UK sample
-uk_sample = cd.open_data_dump(
-    f"{project_directory}/outputs/data/uk_sample_07-06-2021_22-11-2021.json"
+# UK sample (flattened adverts table, only the columns needed)
+uk_sample = cd.read_adverts(
+    f"{project_directory}/outputs/data/uk_sample_07-06-2021_22-11-2021.json",
+    columns=["id", "created", "nuts_2_code", "parent_sector", "sector"],
 )
 
 # %%
 ind_uk = uw.sector_df(uk_sample, "parent_sector", "industry")
 
 # %%
-# Set time periods
-jun_aug = ind_uk["2021-06-01":"2021-08-31"]
-sep_nov = ind_uk["2021-09-01":]
+# Count per industry and time period (per day) and percent change
+industry_growth = gr.period_growth(ind_uk.reset_index(), "industry", uw.GROWTH_WINDOWS)
 
 # %%
-# Resample for value counts per day
-ind_uk_day = ind_uk.resample("D")["industry"].value_counts().reset_index(name="count")
-jun_aug_day = jun_aug.resample("D")["industry"].value_counts().reset_index(name="count")
-sep_nov_day = sep_nov.resample("D")["industry"].value_counts().reset_index(name="count")
-
-# %%
-# Group by industry
-jun_aug_sum = jun_aug_day.groupby(["industry"]).sum().reset_index()
-sep_nov_sum = sep_nov_day.groupby(["industry"]).sum().reset_index()
-
-# %%
-# Column names for time periods
-sep_nov_sum["time_period"] = "September to November"
-jun_aug_sum["time_period"] = "June to August"
-
-# %%
-# Adjust for the difference in days
-sep_nov_sum["count"] = (sep_nov_sum["count"] / 83) * 86
-# Monthly sum df
-months_sum = sep_nov_sum.append(jun_aug_sum, ignore_index=True).reset_index(drop=True)
-
-# %%
-# Reset indexe
-ind_uk_day.set_index("created", inplace=True)
-# Groupby month
-ind_uk_month = (
-    ind_uk_day.groupby([pd.Grouper(freq="M"), "industry"]).sum().reset_index()
+# Daily counts (see count_cube), rolled up per month for each industry
+count_cube = cc.CountCube(cc.build_daily_counts(uk_sample))
+ind_uk_month = count_cube.rollup("M", by=["parent_sector"]).rename(
+    columns={"period": "created", "parent_sector": "industry", "adverts": "count"}
 )
+ind_uk_month["industry"] = ind_uk_month["industry"].str.replace("&amp; ", "")
 
 # %%
 # Top industries to include in plot
@@ -112,25 +92,16 @@ ind_uk_month = ind_uk_month.pivot_table(
 ind_uk_month.fillna(0, inplace=True)
 ind_totals = ind_uk_month.T
 ind_totals["total count"] = ind_totals[list(ind_totals.columns)].sum(axis=1)
-ind_totals["Percent vacancies"] = (ind_totals["total count"] / 41515) * 100
+ind_totals["Percent vacancies"] = (ind_totals["total count"] / len(uk_sample)) * 100
 
 # %%
 # Percent change in time periods
-time_periods = months_sum.pivot_table(
-    index=["time_period"], columns="industry", values="count"
-)
-time_periods = time_periods.pct_change()
-time_periods.drop(time_periods.index[:1], inplace=True)
-time_periods = time_periods.T
-time_periods.columns = ["Percent change"]
-# Merge x2 dfs
-time_periods = time_periods.merge(
+time_periods = industry_growth[["Percent change"]].merge(
     ind_totals["Percent vacancies"].to_frame(), left_index=True, right_index=True
 )
 time_periods = time_periods.reset_index().sort_values(
     by="Percent change", ascending=False
 )
-time_periods["Percent change"] = time_periods["Percent change"] * 100
 
 # %%
 # Plot growth of top industries
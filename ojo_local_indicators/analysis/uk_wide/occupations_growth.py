@@ -29,6 +29,7 @@ from ojd_daps.dqa.data_getters import get_valid_cache_dates
 
 import ojo_local_indicators
 import ojo_local_indicators.pipeline.clean_data as cd
+import ojo_local_indicators.pipeline.growth as gr
 import ojo_local_indicators.pipeline.uk_wide as uw
 
 import matplotlib.pyplot as plt
@@ -42,44 +43,26 @@ import seaborn as sns
 project_directory = ojo_local_indicators.PROJECT_DIR
 
 # %%
-# UK sample
-uk_sample = cd.open_data_dump(
-    f"{project_directory}/outputs/data/uk_sample_07-06-2021_22-11-2021.json"
+# UK sample (flattened adverts table, only the columns needed)
+uk_sample = cd.read_adverts(
+    f"{project_directory}/outputs/data/uk_sample_07-06-2021_22-11-2021.json",
+    columns=["created", "sector"],
 )
 
 # %%
 occ_uk = uw.sector_df(uk_sample, "sector", "occupations")
 
 # %%
-# Set time periods
-jun_aug = occ_uk["2021-06-01":"2021-08-31"]
-sep_nov = occ_uk["2021-09-01":]
+# Count per occupation and time period (per day) and percent change
+occupation_growth = gr.period_growth(
+    occ_uk.reset_index(), "occupations", uw.GROWTH_WINDOWS
+)
 
 # %%
 # Resample for value counts per day
 occ_uk_day = (
     occ_uk.resample("D")["occupations"].value_counts().reset_index(name="count")
 )
-jun_aug_day = (
-    jun_aug.resample("D")["occupations"].value_counts().reset_index(name="count")
-)
-sep_nov_day = (
-    sep_nov.resample("D")["occupations"].value_counts().reset_index(name="count")
-)
-
-# %%
-# Group by occupation
-jun_aug_sum = jun_aug_day.groupby(["occupations"]).sum().reset_index()
-sep_nov_sum = sep_nov_day.groupby(["occupations"]).sum().reset_index()
-# Column names for time periods
-sep_nov_sum["time_period"] = "September to November"
-jun_aug_sum["time_period"] = "June to August"
-
-# %%
-# Adjust for difference in days
-sep_nov_sum["count"] = (sep_nov_sum["count"] / 83) * 86
-# Monthly sum df
-months_sum = sep_nov_sum.append(jun_aug_sum, ignore_index=True).reset_index(drop=True)
 # Total sum occupations per month
 occ_uk_day.set_index("created", inplace=True)
 occ_uk_month = (
@@ -91,7 +74,7 @@ occ_uk_month = occ_uk_month.pivot_table(
 occ_uk_month.fillna(0, inplace=True)
 occ_totals = occ_uk_month.T
 occ_totals["total count"] = occ_totals[list(occ_totals.columns)].sum(axis=1)
-occ_totals["Percent vacancies"] = (occ_totals["total count"] / 41515) * 100
+occ_totals["Percent vacancies"] = (occ_totals["total count"] / len(uk_sample)) * 100
 
 # %%
 # Occupations with a greater than 1% share
@@ -99,21 +82,12 @@ occupations_top = list(occ_totals[occ_totals["Percent vacancies"] > 1].index)
 
 # %%
 # Percent change per time period
-time_periods = months_sum.pivot_table(
-    index=["time_period"], columns="occupations", values="count"
-)
-time_periods = time_periods.pct_change()
-time_periods.drop(time_periods.index[:1], inplace=True)
-time_periods = time_periods.T
-time_periods.columns = ["Percent change"]
-# Merge dfs
-time_periods = time_periods.merge(
+time_periods = occupation_growth[["Percent change"]].merge(
     occ_totals["Percent vacancies"].to_frame(), left_index=True, right_index=True
 )
 time_periods = time_periods.reset_index().sort_values(
     by="Percent change", ascending=False
 )
-time_periods["Percent change"] = time_periods["Percent change"] * 100
 time_periods_top = time_periods[time_periods["occupations"].isin(occupations_top)]
 
 # %%
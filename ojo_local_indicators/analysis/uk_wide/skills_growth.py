@@ -30,12 +30,16 @@ from ojd_daps.dqa.data_getters import get_valid_cache_dates
 
 import ojo_local_indicators
 import ojo_local_indicators.pipeline.clean_data as cd
+import ojo_local_indicators.pipeline.growth as gr
+import ojo_local_indicators.pipeline.locations as loc
+import ojo_local_indicators.pipeline.skill_cube as sc
+import ojo_local_indicators.pipeline.uk_wide as uw
+from ojo_local_indicators.getters.job_ads import iter_job_ads
 
 import matplotlib.pyplot as plt
 import altair as alt
 import plotly.express as px
 import seaborn as sns
-from collections import Counter
 
 # %%
 # Set directory
@@ -50,40 +54,19 @@ uk_ads = cd.open_data_dump(
 )
 
 # %%
-job_ads1 = get_cached_job_ads("07-06-2021", "19-07-2021")
-job_ads2 = get_cached_job_ads("19-07-2021", "30-08-2021")
-job_ads3 = get_cached_job_ads("30-08-2021", "11-10-2021")
-job_ads4 = get_cached_job_ads("11-10-2021", "22-11-2021")
-
-# %%
-job_ads = job_ads1 + job_ads2 + job_ads3 + job_ads4
-
-# %%
-filtered_dict = {(d["id"]): d for d in job_ads}
-job_ads_de_dup = [value for value in filtered_dict.values()]
-
-# %%
-fixes = pd.read_excel(f"{project_directory}/inputs/data/nuts_2_fixes.xlsx")
-fixes = fixes[["job_location_raw", "Code"]].copy()
-# Locations list (correct names)
-locations_n = cd.get_location_fields(job_ads, "nuts_2_name")
-locations_c = cd.get_location_fields(job_ads, "nuts_2_code")
-locations_n = list(dict.fromkeys(locations_n))
-locations_c = list(dict.fromkeys(locations_c))
-locations_n = [i for i in locations_n if i]
-locations_c = [i for i in locations_c if i]
-locations = pd.DataFrame(list(zip(locations_n, locations_c)), columns=["Name", "Code"])
-fixes = fixes.merge(locations, on="Code", how="left")
+# Remove duplicates as the windows are read (last copy kept)
+counts = {}
+job_ads_de_dup = list(
+    cd.dedup_adverts(lambda: iter_job_ads(uw.UK_WINDOWS), keep="last", counts=counts)
+)
+counts
 
 # %%
-# Takes about 5 mins...
-for index, row in fixes.iterrows():
-    for my_dict in job_ads_de_dup:
-        if all(k in my_dict for k in ("job_location_raw", "features")):
-            if my_dict["job_location_raw"] == row["job_location_raw"]:
-                if "location" in my_dict["features"]:
-                    my_dict["features"]["location"]["nuts_2_code"] = row["Code"]
-                    my_dict["features"]["location"]["nuts_2_name"] = row["Name"]
+fix_lookup = loc.read_fix_lookup(
+    f"{project_directory}/inputs/data/nuts_2_fixes.xlsx", job_ads_de_dup
+)
+touched = loc.apply_location_fixes(job_ads_de_dup, fix_lookup)
+print("Adverts updated:", sum(touched.values()))
 
 # %%
 uk_ads = job_ads_de_dup
@@ -106,188 +89,48 @@ def get_skills(data):
 
 # %%
 uk_skills = get_skills(uk_ads)
-created_uk = [d["created"] for d in uk_ads if "created" in d]
 
 # %%
 uk_skills[100]
 
 # %%
-skills_uk = pd.DataFrame(
-    list(zip(uk_skills, created_uk)), columns=["skills", "created"]
-)
-
-# %%
-skills_uk["created"] = pd.to_datetime(skills_uk["created"], format="%Y-%m-%d")
-
-# %%
-skills_uk.set_index("created", inplace=True)
-skills_uk.sort_index(inplace=True)
-
-# %%
-jun_aug = skills_uk["2021-06-01":"2021-08-31"]
-sep_nov = skills_uk["2021-09-01":]
-print("June-aug Dataset:", jun_aug.shape)
-print("Sep-nov Dataset:", sep_nov.shape)
-
-# %%
-jun_aug_skills = list(jun_aug["skills"])
-sep_nov_skills = list(sep_nov["skills"])
-
-
-# %%
-def skill_map(skills, label1, label2):
-    l1 = []
-    l2 = []
-    for skill in skills:
-        if skill is None:
-            unique_counts = {}
-        else:
-            for s in skill:
-                l1.append(s[label1])
-                l2.append(s[label2])
-    return l1, l2
-
-
-# %%
-def skill_count(skills, label):
-    count_list = []
-    for skill in skills:
-        if skill is None:
-            unique_counts = {}
-        # else:
-        # if s[label] is None:
-        #       unique_counts = {}
-        else:
-            unique_counts = Counter(s[label] for s in skill)
-            unique_counts = {x: 1 for x in dict(unique_counts)}
-        count_list.append(unique_counts)
-    return count_list
-
-
-# %%
-def combine(dictionaries):
-    combined_dict = {}
-    for dictionary in dictionaries:
-        for key, value in dictionary.items():
-            combined_dict.setdefault(key, []).append(value)
-    return combined_dict
-
-
-# %%
-l0, l2 = skill_map(uk_skills, "label_cluster_0", "label_cluster_2")
-skill_groups = pd.DataFrame({"Skill_0": l0, "Skill_2": l2})
-skill_groups.drop_duplicates(inplace=True)
+# Skill groups (label_cluster_0) and the narrower groups (label_cluster_2) in them
+skill_groups = sc.taxonomy([s for skill in uk_skills if skill for s in skill])
+skill_groups = skill_groups[["label_cluster_0", "label_cluster_2"]].drop_duplicates()
+skill_groups.columns = ["Skill_0", "Skill_2"]
 skill_groups.reset_index(drop=True, inplace=True)
 
 # %%
 skill_groups.head(1)
 
 # %%
-len(skills_uk)
-
-# %%
-len(jun_aug_skills) + len(sep_nov_skills)
-
-# %%
-print(len(jun_aug_skills))
-print(len(sep_nov_skills))
-
-# %%
-jun_aug_2 = skill_count(jun_aug_skills, "label_cluster_2")
-jun_aug_0 = skill_count(jun_aug_skills, "label_cluster_0")
-sep_nov_2 = skill_count(sep_nov_skills, "label_cluster_2")
-sep_nov_0 = skill_count(sep_nov_skills, "label_cluster_0")
-
-# %%
-jun_aug_2s = combine(jun_aug_2)
-jun_aug_2s = combine(jun_aug_0)
-sep_nov_2s = combine(sep_nov_2)
-sep_nov_2s = combine(sep_nov_0)
+# Number of adverts (all, and mentioning each skill group) per day
+skill_cube = sc.build_skill_cube_from_adverts(uk_ads)
 
 # %%
-list(jun_aug_2s.keys())[0]
-
-# %%
-skills_2 = []
-for skill in list(jun_aug_2s.keys()):
-    # skills_2.append((sum(jun_aug_2s[skill]) / 22146)*100)
-    skills_2.append(sum(jun_aug_2s[skill]))
-
-df2_jun_aug = pd.DataFrame(
-    {"Skill": list(jun_aug_2s.keys()), "Jun-Aug count": skills_2}
+# Adverts mentioning each skill group (label_cluster_0) per time period (per
+# day and as a percent of all adverts), growth and change in percent share
+skills2_total = gr.period_growth(
+    sc.slice_cube(skill_cube, "label_cluster_0"),
+    "label",
+    uw.GROWTH_WINDOWS,
+    date="date",
+    count="adverts",
+    adverts=sc.slice_cube(skill_cube, sc.ALL_ADVERTS),
 )
-
-# %%
-skills_2 = []
-for skill in list(sep_nov_2s.keys()):
-    # skills_2.append((sum(sep_nov_2s[skill]) / 19369)*100)
-    skills_2.append(round((sum(sep_nov_2s[skill]) / 83) * 86))
-
-df2_sep_nov = pd.DataFrame(
-    {"Skill": list(sep_nov_2s.keys()), "Sep-Nov count": skills_2}
-)
-
-# %%
-df2_jun_aug = df2_jun_aug[df2_jun_aug.Skill.notna()]
-df2_sep_nov = df2_sep_nov[df2_sep_nov.Skill.notna()]
-
-# %%
-skills2_total = df2_jun_aug.merge(df2_sep_nov, how="inner", on="Skill")
-
-# %%
-skills2_total.set_index("Skill", inplace=True)
-
-# %%
-skills2_total["Jun-Aug percent vacancies"] = (
-    skills2_total["Jun-Aug count"] / 22146
-) * 100
-skills2_total["Sep-Nov percent vacancies"] = (
-    skills2_total["Sep-Nov count"] / 19369
-) * 100
+skills2_total.index.name = "Skill"
 
 # %%
 skills2_total
 
 # %%
-percent_share_change = list(
-    skills2_total[
-        ["Jun-Aug percent vacancies", "Sep-Nov percent vacancies"]
-    ].pct_change(axis="columns")["Sep-Nov percent vacancies"]
-)
-
-# %%
-percent_share_change = [element * 100 for element in percent_share_change]
-
-# %%
-percent_share_change
-
-# %%
-skills2_total["Percent share difference"] = (
-    skills2_total["Sep-Nov percent vacancies"]
-    - skills2_total["Jun-Aug percent vacancies"]
-)
-
-# %%
-skills2_total.drop(
-    ["Jun-Aug percent vacancies", "Sep-Nov percent vacancies"], axis=1, inplace=True
-)
-
-# %%
-percent_growth = list(
-    skills2_total[["Jun-Aug count", "Sep-Nov count"]].pct_change(axis="columns")[
-        "Sep-Nov count"
-    ]
-)
-
-# %%
-percent_growth = [element * 100 for element in percent_growth]
-
-# %%
-skills2_total.drop(["Jun-Aug count", "Sep-Nov count"], axis=1, inplace=True)
-
-# %%
-skills2_total["percent_growth"] = percent_growth
-skills2_total["percent_share_change"] = percent_share_change
+jun_aug_share = skills2_total["June to August percent vacancies"]
+sep_nov_share = skills2_total["September to November percent vacancies"]
+skills2_total["percent_growth"] = skills2_total["Percent change"]
+skills2_total["percent_share_change"] = (sep_nov_share / jun_aug_share - 1) * 100
+skills2_total = skills2_total[
+    ["Percent share difference", "percent_growth", "percent_share_change"]
+]
 
 # %%
 skills2_total
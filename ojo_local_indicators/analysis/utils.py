@@ -14,22 +14,33 @@
 #     name: python3
 # ---
 
+# %%
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# %%
+# Punctuation removed from job titles (all but /-'), and '/' and '-' changed
+# to spaces, in one translation table
+TITLE_TRANSLATION = str.maketrans(
+    {
+        **dict.fromkeys('!"#$%&\\()*+,.:;<=>?@[]^_`{|}~'),
+        "/": " ",
+        "-": " ",
+    }
+)
+
+
 # %% [markdown]
 # ### Function to clean job titles (lightly)
 
 # %%
 def clean_titles(raw_job_title, EXCLUDED_TERMS):
 
-    # Make lower case
-    job_title = raw_job_title.lower()
-
-    # Remove punctuation, except /-'
-    job_title = job_title.translate(
-        str.maketrans("", "", '!"#$%&\()*+,.:;<=>?@[\\]^_`{|}~')
-    )
-
-    # Change '/' to a space and '-' to space
-    job_title = job_title.replace("/", " ").replace("-", " ")
+    # Make lower case, remove punctuation (except /-') and change '/' and '-'
+    # to spaces
+    job_title = raw_job_title.lower().translate(TITLE_TRANSLATION)
 
     # Drop EXCLUDED terms
     job_title = " ".join(
@@ -39,6 +50,57 @@ def clean_titles(raw_job_title, EXCLUDED_TERMS):
     return job_title
 
 
+# %%
+class TitleNormaliser:
+    """Cleans job titles as clean_titles does, caching the last max_size raw
+    titles seen (titles repeat a lot), e.g.
+
+        normalise = TitleNormaliser(EXCLUDED_TERMS)
+        job_title = normalise(raw_job_title)
+        job_titles = normalise.batch(df["job_title_raw"])
+    """
+
+    def __init__(self, excluded_terms=(), max_size=2**16):
+        self.excluded_terms = frozenset(excluded_terms)
+        self._cached = lru_cache(maxsize=max_size)(self._clean)
+
+    def _clean(self, raw_job_title):
+        job_title = raw_job_title.lower().translate(TITLE_TRANSLATION)
+        return " ".join(
+            [word for word in job_title.split() if word not in self.excluded_terms]
+        )
+
+    def __call__(self, raw_job_title):
+        return self._cached(raw_job_title)
+
+    def batch(self, raw_job_titles):
+        """Cleans a list or pandas series of titles, each distinct title once.
+        Returns a list, or a series with the same index. Missing titles (None
+        or NaN) are None in both."""
+        if not isinstance(raw_job_titles, pd.Series):
+            return self.batch(pd.Series(list(raw_job_titles), dtype=object)).tolist()
+        # Missing titles are coded -1, i.e. the None at the end
+        codes, uniques = pd.factorize(raw_job_titles)
+        cleaned = np.array([self(title) for title in uniques] + [None], object)
+        return pd.Series(
+            cleaned[codes],
+            index=raw_job_titles.index,
+            name=raw_job_titles.name,
+            dtype=object,
+        )
+
+    @property
+    def hits(self):
+        return self._cached.cache_info().hits
+
+    @property
+    def misses(self):
+        return self._cached.cache_info().misses
+
+    def cache_clear(self):
+        self._cached.cache_clear()
+
+
 # %% [markdown]
 # ### Function to extract and annualise salaries
 
@@ -85,4 +147,58 @@ def annualises_salary(one_job):
                 min_salary = raw_min_salary * 37.5 * 52
                 max_salary = raw_max_salary * 37.5 * 52
 
+            # Ignore other (unknown) units
+            else:
+                min_salary = None
+                max_salary = None
+
     return [min_salary, max_salary]
+
+
+# %% [markdown]
+# ### Function to annualise the salaries of many adverts at once
+
+# %%
+# Multipliers to annual salaries per unit, applied one after the other
+# (as in annualises_salary) so that both functions give the same floats
+PER_DAY = {"YEAR": 1, "DAY": 5, "HOUR": 37.5}
+PER_YEAR = {"YEAR": 1, "DAY": 52, "HOUR": 52}
+
+
+# %%
+def _lookup(values, mapping, default):
+    """Maps an array (or pandas column) of values through a dictionary,
+    looking up each distinct value once."""
+    codes, uniques = pd.factorize(pd.Series(values))
+    # Missing values get code -1, i.e. the default at the end
+    table = [mapping.get(value, default) for value in uniques] + [default]
+    return np.array(table)[codes]
+
+
+# %%
+def annualises_salaries(
+    raw_salary, raw_min_salary, raw_max_salary, salary_unit, salary_currency
+):
+    """Same as annualises_salary, for arrays (or pandas columns) of the raw
+    salary fields of many adverts. Returns arrays of min and max salaries,
+    NaN where annualises_salary gives None."""
+    raw_salary = np.asarray(raw_salary, dtype=float)
+
+    # If only one salary is given, treat it as the minimum and the maximum
+    single = ~np.isnan(raw_salary)
+    raw_min_salary = np.where(single, raw_salary, np.asarray(raw_min_salary, float))
+    raw_max_salary = np.where(single, raw_salary, np.asarray(raw_max_salary, float))
+
+    # Convert daily and hourly salaries to annual salaries
+    per_day = _lookup(salary_unit, PER_DAY, np.nan)
+    per_year = _lookup(salary_unit, PER_YEAR, np.nan)
+    min_salary = raw_min_salary * per_day * per_year
+    max_salary = raw_max_salary * per_day * per_year
+
+    # Ignore foreign currencies and adverts with no (minimum) salary
+    missing = ~_lookup(salary_currency, {"GBP": True}, False)
+    missing |= np.isnan(raw_min_salary)
+    min_salary[missing] = np.nan
+    max_salary[missing] = np.nan
+
+    return min_salary, max_salary
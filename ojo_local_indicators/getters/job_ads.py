@@ -0,0 +1,165 @@
+# ---
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: -all
+#     comment_magics: true
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#       jupytext_version: 1.13.2
+#   kernelspec:
+#     display_name: ojo_local_indicators
+#     language: python
+#     name: ojo_local_indicators
+# ---
+
+# %% [markdown]
+# ### Cached job ads for several date windows, fetched concurrently
+
+# %%
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from filelock import FileLock
+
+import ojo_local_indicators
+from ojo_local_indicators import logger
+from ojo_local_indicators.getters.stream_data import iter_adverts
+
+# %%
+# Set directory
+project_directory = ojo_local_indicators.PROJECT_DIR
+
+# Where each window of job ads is stored locally
+PATH_TO_WINDOW_CACHE = f"{project_directory}/outputs/data/job_ads_cache"
+
+# Oldest windows are removed when the local cache grows above this size
+MAX_CACHE_BYTES = 20 * 1024**3
+
+
+# %%
+def remote_backend(start, end):
+    """Gets job ads from the ojd_daps cache for a window ("dd-mm-yyyy" dates)."""
+    from ojd_daps.dqa.data_getters import get_cached_job_ads
+
+    return get_cached_job_ads(start, end)
+
+
+# %%
+def local_dir_backend(path):
+    """Creates a backend reading windows from "{start}_{end}.json" files in a
+    local directory (e.g. in place of the remote store for tests)."""
+
+    def fetch(start, end):
+        with open(f"{path}/{start}_{end}.json") as json_file:
+            return json.load(json_file)
+
+    return fetch
+
+
+# %%
+def _window_path(cache_dir, start, end):
+    """Path of a window of job ads in the local cache."""
+    return f"{cache_dir}/{start}_{end}.json"
+
+
+# %%
+def evict_windows(cache_dir=PATH_TO_WINDOW_CACHE, max_bytes=MAX_CACHE_BYTES):
+    """Removes the least recently used windows until the local cache is
+    at most max_bytes. Returns the paths removed."""
+    windows = sorted(Path(cache_dir).glob("*.json"), key=lambda p: p.stat().st_mtime)
+    total = sum(p.stat().st_size for p in windows)
+    removed = []
+    for path in windows:
+        if total <= max_bytes:
+            break
+        total -= path.stat().st_size
+        path.unlink()
+        removed.append(str(path))
+    return removed
+
+
+# %%
+def cache_window(
+    start, end, backend=remote_backend, cache_dir=PATH_TO_WINDOW_CACHE, refresh=False
+):
+    """Makes sure one window of job ads is in the local cache (fetching it
+    from the backend if needed, without keeping it in memory) and returns
+    its path. With refresh=True the window is fetched again even if cached
+    (e.g. the latest window, which can still get adverts)."""
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _window_path(cache_dir, start, end)
+    # Lock so sibling scripts never fetch the same window at the same time
+    with FileLock(path + ".lock"):
+        if os.path.exists(path) and not refresh:
+            os.utime(path)  # Mark as recently used
+        else:
+            logger.info(f"Fetching job ads {start} to {end}")
+            with open(path + ".tmp", "w") as json_file:
+                json.dump(backend(start, end), json_file)
+            os.replace(path + ".tmp", path)
+    return path
+
+
+# %%
+def get_window(
+    start, end, backend=remote_backend, cache_dir=PATH_TO_WINDOW_CACHE, refresh=False
+):
+    """Gets the job ads for one window from the local cache, or from the
+    backend (saving them to the local cache) if not there yet or refresh."""
+    with open(cache_window(start, end, backend, cache_dir, refresh)) as json_file:
+        return json.load(json_file)
+
+
+# %%
+def iter_job_ads(
+    windows,
+    backend=remote_backend,
+    cache_dir=PATH_TO_WINDOW_CACHE,
+    max_bytes=MAX_CACHE_BYTES,
+    max_workers=4,
+    refresh=(),
+):
+    """Yields the job ads for a list of (start, end) windows one at a time,
+    window by window, fetching the windows not cached locally (or in
+    refresh) in parallel."""
+    refresh = {tuple(window) for window in refresh}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        paths = executor.map(
+            lambda window: cache_window(
+                *window, backend, cache_dir, tuple(window) in refresh
+            ),
+            windows,
+        )
+        for path in paths:
+            yield from iter_adverts(path)
+    evict_windows(cache_dir, max_bytes)
+
+
+# %%
+def get_job_ads(
+    windows,
+    backend=remote_backend,
+    cache_dir=PATH_TO_WINDOW_CACHE,
+    max_bytes=MAX_CACHE_BYTES,
+    max_workers=4,
+    refresh=(),
+):
+    """Gets and combines the job ads for a list of (start, end) windows,
+    fetching the windows that are not cached locally (or in refresh) in
+    parallel."""
+    refresh = {tuple(window) for window in refresh}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        windows_ads = list(
+            executor.map(
+                lambda window: get_window(
+                    *window, backend, cache_dir, tuple(window) in refresh
+                ),
+                windows,
+            )
+        )
+    evict_windows(cache_dir, max_bytes)
+    return [job_ad for job_ads in windows_ads for job_ad in job_ads]
@@ -17,6 +17,7 @@
 # %%
 import json
 import ojo_local_indicators
+from ojo_local_indicators.getters.stream_data import iter_adverts
 
 # %%
 # Set directory
@@ -26,15 +27,41 @@ project_directory = ojo_local_indicators.PROJECT_DIR
 sussex_file = "sussex_07-06-2021_22-11-2021_surrey_rem.json"
 uk_sample_file = "uk_sample_07-06-2021_22-11-2021.json"
 
+# Datasets that can be loaded by name (files in outputs/data)
+DATASETS = {"sussex": sussex_file, "uk_sample": uk_sample_file}
+
+# Datasets loaded so far in this process, keyed by (name, fields)
+_loaded = {}
+
 
 # %%
-def open_json_data(file):
-    """Loads and returns data from JSON file."""
+def open_json_data(file, fields=None):
+    """Loads and returns data from JSON file.
+    If fields are given only those (dotted) fields are kept per advert."""
+    if fields is not None:
+        return list(iter_adverts(file, fields))
     with open(file) as json_file:
         data = json.load(json_file)
     return data
 
 
 # %%
-sussex = open_json_data(f"{project_directory}/outputs/data/" + sussex_file)
-uk_sample = open_json_data(f"{project_directory}/outputs/data/" + uk_sample_file)
+def load(name, fields=None):
+    """Loads a dataset by name (see DATASETS), caching it for the process.
+    If fields are given only those (dotted) fields are kept per advert."""
+    if name not in DATASETS:
+        raise KeyError(f"Unknown dataset {name}, choose from {list(DATASETS)}")
+    key = (name, None if fields is None else tuple(fields))
+    if key not in _loaded:
+        _loaded[key] = open_json_data(
+            f"{project_directory}/outputs/data/" + DATASETS[name], fields
+        )
+    return _loaded[key]
+
+
+# %%
+def __getattr__(name):
+    """Loads datasets (e.g. od.sussex, od.uk_sample) on first access."""
+    if name in DATASETS:
+        return load(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
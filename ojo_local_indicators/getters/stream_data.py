@@ -0,0 +1,122 @@
+# ---
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: -all
+#     comment_magics: true
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#       jupytext_version: 1.13.2
+#   kernelspec:
+#     display_name: ojo_local_indicators
+#     language: python
+#     name: ojo_local_indicators
+# ---
+
+# %%
+import json
+from itertools import islice
+
+# %%
+# Characters read from file per chunk
+CHUNK_SIZE = 1 << 20
+
+_decoder = json.JSONDecoder()
+
+
+# %%
+def project_fields(advert, fields):
+    """Keeps only the (dotted) fields in an advert dictionary,
+    e.g. ["id", "created", "features.location"], keeping the nesting."""
+    projected = {}
+    for field in fields:
+        *parents, leaf = field.split(".")
+        source = advert
+        for key in parents:
+            source = source.get(key) if isinstance(source, dict) else None
+        # Missing fields are left out (without empty parents)
+        if not isinstance(source, dict) or leaf not in source:
+            continue
+        target = projected
+        for key in parents:
+            target = target.setdefault(key, {})
+        target[leaf] = source[leaf]
+    return projected
+
+
+# %%
+def _iter_json_array(json_file, chunk_size):
+    """Yields the items of a JSON array one at a time, reading the
+    file in chunks."""
+    # Skip whitespace (over as many chunks as needed) and the opening "["
+    buffer = ""
+    while not buffer:
+        chunk = json_file.read(chunk_size)
+        if not chunk:
+            return
+        buffer = chunk.lstrip()
+    buffer = buffer[1:]
+    pos = 0
+    eof = False
+    while True:
+        # Skip whitespace and separators between items
+        while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+            pos += 1
+        if pos < len(buffer) and buffer[pos] == "]":
+            return
+        try:
+            item, end = _decoder.raw_decode(buffer, pos)
+            complete = end < len(buffer) or eof
+        except json.JSONDecodeError:
+            if eof:
+                if buffer[pos:].strip():
+                    raise
+                return
+            complete = False
+        if complete:
+            pos = end
+            yield item
+        else:
+            # Item may be incomplete: drop what has been read and load more
+            chunk = json_file.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+
+# %%
+def _iter_json_lines(json_file):
+    """Yields the items of a JSON lines file one at a time."""
+    for line in json_file:
+        if line.strip():
+            yield json.loads(line)
+
+
+# %%
+def iter_adverts(file, fields=None, chunk_size=CHUNK_SIZE):
+    """Yields adverts one at a time from a JSON array or JSON lines file,
+    optionally keeping only the (dotted) fields."""
+    with open(file) as json_file:
+        first = json_file.read(1)
+        while first.isspace():
+            first = json_file.read(1)
+        json_file.seek(0)
+        if first == "[":
+            adverts = _iter_json_array(json_file, chunk_size)
+        else:
+            adverts = _iter_json_lines(json_file)
+        for advert in adverts:
+            yield advert if fields is None else project_fields(advert, fields)
+
+
+# %%
+def iter_batches(file, batch_size=10000, fields=None):
+    """Yields lists of at most batch_size adverts from a JSON array
+    or JSON lines file."""
+    adverts = iter_adverts(file, fields)
+    while True:
+        batch = list(islice(adverts, batch_size))
+        if not batch:
+            return
+        yield batch
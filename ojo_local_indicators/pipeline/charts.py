@@ -0,0 +1,485 @@
+# ---
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: -all
+#     comment_magics: true
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#       jupytext_version: 1.13.2
+#   kernelspec:
+#     display_name: ojo_local_indicators
+#     language: python
+#     name: ojo_local_indicators
+# ---
+
+# %% [markdown]
+# ### Skills charts
+#
+# The three matplotlib charts of the skills analyses (digital, transversal
+# and the deep dives), drawn from small tables of already aggregated values:
+#
+# - `salary_ranges`: median minimum and maximum salaries of the most
+#   mentioned skills (label, median_min_salaries, median_max_salaries)
+# - `skill_bubbles`: percent of the adverts of each occupation (rows)
+#   mentioning each skill (columns)
+# - `one_skill`: percent of the adverts of each occupation mentioning one
+#   skill (label, skill_percent)
+#
+# A chart job (see `chart_job`) holds the chart type, its table, the output
+# path and the style options. `render_charts` renders jobs in a process pool
+# on Agg canvases (the matplotlib object API, not pyplot, so the backend of a
+# notebook forked into the workers doesn't matter): only the tables are sent
+# to the workers, which don't recompute anything.
+#
+# Rendered charts are kept in a figure cache, named after a hash of what
+# they show: chart type and code of this module (drawing functions and their
+# helpers), table (so also the parameters it
+# was built with, e.g. the number of skills), style options (e.g. colours and
+# bubble scale) and resolution. Charts already in the cache are copied from
+# it rather than rendered again. Cached charts not used by a run are removed,
+# least recently used first, once the cache is over a size limit. Images in
+# the folders of the charts that no job writes (e.g. charts of jobs since
+# renamed or removed) are listed in the summary as orphaned and, if a size
+# limit is given for them (max_orphaned_bytes), the oldest are removed until
+# they are under it.
+
+# %%
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.ticker import StrMethodFormatter
+
+import ojo_local_indicators
+from ojo_local_indicators import logger
+from ojo_local_indicators.pipeline.flatten_data import file_hash
+
+# %%
+# Set directory
+project_directory = ojo_local_indicators.PROJECT_DIR
+
+# Where rendered charts are cached, named after their hash
+PATH_TO_FIGURE_CACHE = f"{project_directory}/outputs/figures/.cache"
+
+# Size the figure cache is trimmed to (charts used by the run are kept)
+FIGURE_CACHE_MAX_BYTES = 500 * 2**20
+
+# Resolution of the saved charts
+DPI = 200
+
+# Default style options of each chart type
+CHART_OPTIONS = {
+    "salary_ranges": {
+        "figsize": (12, 15),
+        "y_label": "Most-mentioned skills",
+    },
+    "skill_bubbles": {
+        "figsize": (12, 12),
+        "scale_bubble": 10,
+        "x_label": "Most-mentioned skills",
+        "x_label_coords": (0.35, 1.36),
+        "y_label": "Occupations",
+        "y_label_coords": (-0.15, 0.97),
+    },
+    "one_skill": {
+        "figsize": (15, 12),
+        "x_label": "Percentage of job adverts requiring the skill",
+        "x_label_size": 18,
+        "tick_size": 16,
+        "y_label_coords": (0.5, 0.99),
+    },
+}
+
+
+# %%
+def salary_ranges_data(skills):
+    """Table of the salary_ranges chart from skill dictionaries with median
+    salaries (in the order shown, top to bottom)."""
+    return pd.DataFrame(
+        {
+            "label": [value["label"] for value in skills],
+            "median_min_salaries": [value["median_min_salaries"] for value in skills],
+            "median_max_salaries": [value["median_max_salaries"] for value in skills],
+        }
+    )
+
+
+# %%
+def skill_bubbles_data(percents, occupations, skills):
+    """Table of the skill_bubbles chart from the percents of skill_percents
+    (occupations by skills)."""
+    return pd.DataFrame(percents, index=list(occupations), columns=list(skills))
+
+
+# %%
+def one_skill_data(occupations):
+    """Table of the one_skill chart from the result of
+    occupations_with_skill (in the order shown, bottom to top)."""
+    return pd.DataFrame(occupations, columns=["label", "skill_percent"])
+
+
+# %%
+def chart_job(chart, data, path, **options):
+    """A chart to render: its type, table, output path and style options
+    (colors and those in CHART_OPTIONS)."""
+    return {
+        "chart": chart,
+        "data": data,
+        "path": path,
+        "options": {**CHART_OPTIONS[chart], **options},
+    }
+
+
+# %%
+def _legend(ax, title, bbox_to_anchor):
+    """Legend with a bold title, as in all the skills charts."""
+    legend = ax.legend(
+        scatterpoints=1,
+        frameon=True,
+        labelspacing=1,
+        title=title,
+        bbox_to_anchor=bbox_to_anchor,
+        borderpad=1.5,
+        fontsize=16,
+    )
+    legend.get_title().set_fontsize("18")
+    legend.get_title().set_fontweight("bold")
+
+
+# %%
+def draw_salary_ranges(ax, data, options):
+    """Horizontal line between the median minimum and maximum salaries of
+    each skill, most mentioned at the top."""
+    colors = options["colors"]
+    y = list(range(len(data)))
+    y.reverse()
+    x_median_min = list(data["median_min_salaries"])
+    x_median_max = list(data["median_max_salaries"])
+
+    # Horizontal line and scatter points
+    ax.hlines(y, x_median_min, x_median_max, colors="black", linewidth=1, alpha=0.5)
+    ax.scatter(x_median_min, y, s=30, c=colors[2])
+    ax.scatter(x_median_max, y, s=30, c=colors[3])
+
+    # Add name of each skill
+    for index, label in enumerate(data["label"]):
+        ax.annotate(
+            label.title(),
+            (0.5 * (x_median_min[index] + x_median_max[index]), y[index] + 0.15),
+            ha="center",
+            fontsize=16,
+        )
+
+    # Hide y axis
+    ax.axes.get_yaxis().set_ticks([])
+
+    # Add commas to x axis
+    ax.xaxis.set_major_formatter(StrMethodFormatter("{x:,.0f}"))
+    ax.tick_params(axis="x", labelsize=16)
+
+    # Hide some borders
+    ax.spines["right"].set_visible(False)
+    ax.spines["left"].set_visible(False)
+    ax.spines["top"].set_visible(False)
+
+    # Titles of axes
+    ax.set_xlabel("Annualised advertised salaries (£)", fontsize=18, weight="bold")
+    ax.xaxis.set_label_coords(0.5, -0.05)
+    ax.set_ylabel(options["y_label"], fontsize=18, rotation=0, weight="bold")
+    ax.yaxis.set_label_coords(0.5, 1)
+
+    # Legend
+    for index, label_each_dot in enumerate(
+        ["Median of all minimum salaries", "Median of all maximum salaries"]
+    ):
+        ax.scatter([], [], c=colors[index + 2], alpha=0.75, s=80, label=label_each_dot)
+    _legend(ax, "Salaries", (0.2, 1.15))
+
+
+# %%
+def draw_skill_bubbles(ax, data, options):
+    """Bubble (sized by percent of adverts) for each occupation and skill."""
+    colors = options["colors"]
+    scale_bubble = options["scale_bubble"]
+    n_skills = len(data.columns)
+
+    # Plot scatter points for each occupation, alternating colours so the
+    # chart is easier to read
+    for index_occupation, sizes in enumerate(data.to_numpy()):
+        ax.scatter(
+            list(range(n_skills)),
+            [index_occupation] * n_skills,
+            s=sizes * scale_bubble,
+            c=colors[index_occupation % 2],
+            alpha=0.75,
+        )
+
+    # Hide borders
+    for spine in ["top", "right", "left", "bottom"]:
+        ax.spines[spine].set_visible(False)
+
+    # Titles of axes
+    ax.set_xlabel(options["x_label"], fontsize=18, weight="bold")
+    ax.xaxis.set_label_coords(*options["x_label_coords"])
+    ax.set_ylabel(options["y_label"], fontsize=18, rotation=0, weight="bold")
+    ax.yaxis.set_label_coords(*options["y_label_coords"])
+
+    # Y axis labels
+    ax.set_yticks(list(range(len(data.index))))
+    ax.set_yticklabels(
+        [value.replace("&amp;", "&") for value in data.index], fontsize=16
+    )
+
+    # X axis labels
+    ax.xaxis.tick_top()
+    ax.set_xticks(list(range(n_skills)))
+    ax.set_xticklabels(
+        [value.title() for value in data.columns],
+        rotation=45,
+        ha="left",
+        fontsize=16,
+    )
+    ax.tick_params(axis="both", which="both", length=0)
+
+    # Grid
+    ax.set_axisbelow(True)
+    ax.grid(color="lightgray", linestyle="dashed")
+
+    # Legend
+    for percent in [5, 25, 50, 75]:
+        ax.scatter(
+            [],
+            [],
+            c=colors[0],
+            alpha=0.75,
+            s=percent * scale_bubble,
+            label=str(percent) + "%",
+        )
+    _legend(ax, "Adverts requiring skill", (0, 1.35))
+
+
+# %%
+def draw_one_skill(ax, data, options):
+    """Percent of the adverts of each occupation requiring one skill."""
+    x = list(data["skill_percent"])
+    y = list(range(len(data)))
+    labels = [label.replace("&amp;", "&") for label in data["label"]]
+
+    ax.scatter(x, y, s=100, c=options["colors"][0], label=labels, alpha=0.75)
+
+    # Labels
+    for i, label in enumerate(labels):
+        ax.annotate(label, (x[i] + 1, y[i] - 0.2), fontsize=16)
+
+    # Hide some borders
+    ax.spines["top"].set_visible(False)
+    ax.spines["right"].set_visible(False)
+    ax.spines["left"].set_visible(False)
+
+    # Axis labels
+    ax.axes.get_yaxis().set_ticks([])
+    ax.tick_params(axis="both", which="major", labelsize=options["tick_size"])
+
+    # Titles of axes
+    ax.set_xlabel(options["x_label"], fontsize=options["x_label_size"], weight="bold")
+    ax.xaxis.set_label_coords(0.5, -0.05)
+    ax.set_ylabel(
+        "Occupations (largest to smallest)", fontsize=18, rotation=0, weight="bold"
+    )
+    ax.yaxis.set_label_coords(*options["y_label_coords"])
+
+
+# %%
+# Drawing function of each chart type
+CHART_TYPES = {
+    "salary_ranges": draw_salary_ranges,
+    "skill_bubbles": draw_skill_bubbles,
+    "one_skill": draw_one_skill,
+}
+
+
+# %%
+def _charts_code():
+    """Hash of the source of this module, so charts are rendered again when
+    any drawing code (including helpers such as _legend) changes."""
+    return file_hash(__file__)
+
+
+# %%
+def chart_key(job, dpi=DPI):
+    """Hash of a chart job: chart type and drawing code, table, style options
+    and resolution."""
+    data = job["data"]
+    sha = hashlib.sha256()
+    sha.update(job["chart"].encode())
+    sha.update(_charts_code().encode())
+    sha.update(
+        json.dumps(
+            [[str(column) for column in data.columns], job["options"], dpi],
+            sort_keys=True,
+            default=str,
+        ).encode()
+    )
+    sha.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    return sha.hexdigest()[:16]
+
+
+# %%
+def render_chart(job, dpi=DPI):
+    """Draws and saves one chart job (on an Agg canvas, without pyplot, so
+    whatever backend the calling process uses). Returns the render time in
+    seconds."""
+    start = time.perf_counter()
+    base, extension = os.path.splitext(job["path"])
+    fig = Figure(figsize=job["options"]["figsize"])
+    FigureCanvasAgg(fig)
+    ax = fig.subplots()
+    CHART_TYPES[job["chart"]](ax, job["data"], job["options"])
+    fig.savefig(base + ".tmp" + extension, dpi=dpi, bbox_inches="tight")
+    os.replace(base + ".tmp" + extension, job["path"])
+    return round(time.perf_counter() - start, 3)
+
+
+# %%
+def _remove_oldest(paths, max_bytes, keep=()):
+    """Removes files, least recently modified first, until they take at most
+    max_bytes. Files in keep are counted but not removed. Returns the paths
+    removed."""
+    keep = {os.path.abspath(path) for path in keep}
+    sizes = {path: os.path.getsize(path) for path in paths}
+    size = sum(sizes.values())
+    removed = []
+    for path in sorted(sizes, key=os.path.getmtime):
+        if size <= max_bytes:
+            break
+        if os.path.abspath(path) not in keep:
+            size -= sizes[path]
+            os.remove(path)
+            removed.append(path)
+    return removed
+
+
+# %%
+def clean_figure_cache(cache_dir, max_bytes=FIGURE_CACHE_MAX_BYTES, keep=()):
+    """Removes cached charts, least recently used first, until the cache is
+    at most max_bytes. Charts in keep are not removed. Returns the number of
+    charts removed."""
+    cached = [entry.path for entry in os.scandir(cache_dir) if entry.is_file()]
+    return len(_remove_oldest(cached, max_bytes, keep))
+
+
+# %%
+def orphaned_figures(paths, cache_dir):
+    """Images in the folders of paths (with the same extensions) that are not
+    one of paths, so probably left by chart jobs since renamed or removed.
+    Copies of cached charts (e.g. the charts of another script writing to the
+    same folder) are left out."""
+    paths = {os.path.abspath(path) for path in paths}
+    extensions = {os.path.splitext(path)[1] for path in paths}
+    folders = {os.path.dirname(path) for path in paths} - {os.path.abspath(cache_dir)}
+    candidates = [
+        entry.path
+        for folder in folders
+        for entry in os.scandir(folder)
+        if entry.is_file()
+        and os.path.splitext(entry.name)[1] in extensions
+        and os.path.abspath(entry.path) not in paths
+    ]
+    # Only the cached charts of the same size as a candidate are hashed
+    sizes = {os.path.getsize(path) for path in candidates}
+    cached = {
+        file_hash(entry.path)
+        for entry in os.scandir(cache_dir)
+        if entry.is_file() and entry.stat().st_size in sizes
+    }
+    return sorted(path for path in candidates if file_hash(path) not in cached)
+
+
+# %%
+def render_charts(
+    jobs,
+    max_workers=None,
+    dpi=DPI,
+    cache_dir=PATH_TO_FIGURE_CACHE,
+    max_cache_bytes=FIGURE_CACHE_MAX_BYTES,
+    max_orphaned_bytes=None,
+):
+    """Saves chart jobs, rendering (in a process pool, on Agg canvases) only the
+    charts not in the figure cache. Returns a summary df of the charts: path,
+    hash, whether it was rendered or reused, and render time, followed by the
+    orphaned figures (see orphaned_figures) of their folders. If
+    max_orphaned_bytes is given, the oldest orphaned figures are removed
+    until the others take at most max_orphaned_bytes (e.g. 0 removes them
+    all), with status "removed" in the summary."""
+    start = time.perf_counter()
+    os.makedirs(cache_dir, exist_ok=True)
+    summary = pd.DataFrame(
+        {
+            "chart": [job["chart"] for job in jobs],
+            "path": [job["path"] for job in jobs],
+            "key": [chart_key(job, dpi) for job in jobs],
+        }
+    )
+    summary["cache_path"] = [
+        f"{cache_dir}/{key}{os.path.splitext(path)[1]}"
+        for key, path in zip(summary["key"], summary["path"])
+    ]
+    # One job for each chart not cached
+    to_render = {
+        cache_path: {**job, "path": cache_path}
+        for job, cache_path in zip(jobs, summary["cache_path"])
+        if not os.path.exists(cache_path)
+    }
+    with ProcessPoolExecutor(max_workers) as executor:
+        seconds = dict(
+            zip(
+                to_render,
+                executor.map(render_chart, to_render.values(), [dpi] * len(to_render)),
+            )
+        )
+    summary["status"] = [
+        "rendered" if cache_path in seconds else "reused"
+        for cache_path in summary["cache_path"]
+    ]
+    summary["seconds"] = summary["cache_path"].map(seconds).fillna(0.0)
+    # Copy the charts to their paths (unless already there) and mark them used
+    for path, cache_path in zip(summary["path"], summary["cache_path"]):
+        os.utime(cache_path)
+        if not os.path.exists(path) or file_hash(path) != file_hash(cache_path):
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            shutil.copyfile(cache_path, path)
+    orphaned = orphaned_figures(summary["path"], cache_dir)
+    removed = clean_figure_cache(cache_dir, max_cache_bytes, summary["cache_path"])
+    rendered = (summary["status"] == "rendered").sum()
+    logger.info(
+        f"Rendered {rendered} charts and reused {len(summary) - rendered} "
+        f"(removed {removed} from the cache) in {time.perf_counter() - start:.1f}s"
+    )
+    summary = summary.drop(columns="cache_path")
+    if orphaned:
+        removed = []
+        if max_orphaned_bytes is not None:
+            removed = _remove_oldest(orphaned, max_orphaned_bytes)
+        logger.info(
+            f"{len(orphaned)} figures aren't written by any chart job "
+            f"(removed {len(removed)})"
+        )
+        orphaned = pd.DataFrame(
+            {
+                "path": orphaned,
+                "status": [
+                    "removed" if path in removed else "orphaned" for path in orphaned
+                ],
+                "seconds": 0.0,
+            }
+        )
+        summary = pd.concat([summary, orphaned], ignore_index=True)
+    return summary
@@ -16,20 +16,34 @@
 
 # %%
 # Import libraries
+import hashlib
 import pandas as pd
 import numpy as np
 import ojo_local_indicators
 import json
+from ojo_local_indicators.getters.stream_data import iter_adverts
+from ojo_local_indicators.pipeline.flatten_data import read_table
+from ojo_local_indicators.pipeline.records import JobAd
 
 
 # %%
-def open_data_dump(file):
-    """Loads and returns data from JSON file."""
+def open_data_dump(file, fields=None):
+    """Loads and returns data from JSON (or JSON lines) file.
+    If fields are given only those (dotted) fields are kept per advert."""
+    if fields is not None:
+        return list(iter_adverts(file, fields))
     with open(file) as json_file:
         data = json.load(json_file)
     return data
 
 
+# %%
+def read_adverts(file, columns=None):
+    """Reads the flattened adverts table for a data dump (created from the
+    JSON file the first time), only loading the columns given."""
+    return read_table(file, "adverts", columns)
+
+
 # %%
 def is_duplicate(data):
     """Keeps only dictionaries where is_duplicate
@@ -38,6 +52,70 @@ def is_duplicate(data):
     return data
 
 
+# %%
+def dedup_adverts(
+    adverts, keep="first", drop_flagged=False, compact=False, counts=None
+):
+    """Yields adverts without repeated ids, optionally dropping adverts where
+    features.is_duplicate is True. Only the ids seen are kept in memory (or,
+    if compact=True, a 128 bit blake2b digest of each), never the adverts.
+    keep="first" streams the first copy of each id.
+    keep="last" keeps the last copy of each id in the input, as
+    {d["id"]: d for d in adverts} does, but yields it where it is in the
+    input rather than where its id first appeared. It reads the adverts
+    twice (first to find how many copies of each id there are), so adverts
+    must be a list or a function returning an iterable (e.g.
+    lambda: iter_job_ads(windows)), not an iterator.
+    The numbers of adverts read, dropped and kept are added to counts (dict)."""
+    counts = {} if counts is None else counts
+    for key in ("read", "repeated_id", "flagged_duplicate", "kept"):
+        counts.setdefault(key, 0)
+    if keep not in ("first", "last"):
+        raise ValueError(f"keep must be 'first' or 'last', not {keep}")
+    if keep == "last" and not callable(adverts) and iter(adverts) is adverts:
+        raise ValueError("keep='last' reads the adverts twice, not an iterator")
+    read = adverts if callable(adverts) else lambda: adverts
+
+    def key_of(d):
+        if compact:
+            return hashlib.blake2b(repr(d["id"]).encode(), digest_size=16).digest()
+        return d["id"]
+
+    def unique():
+        if keep == "first":
+            seen = set()
+            for d in read():
+                counts["read"] += 1
+                key = key_of(d)
+                if key in seen:
+                    counts["repeated_id"] += 1
+                    continue
+                seen.add(key)
+                yield d
+        else:
+            # Copies of each id still to come
+            copies = {}
+            for d in read():
+                key = key_of(d)
+                copies[key] = copies.get(key, 0) + 1
+            for d in read():
+                counts["read"] += 1
+                key = key_of(d)
+                copies[key] -= 1
+                if copies[key]:
+                    counts["repeated_id"] += 1
+                    continue
+                del copies[key]
+                yield d
+
+    for d in unique():
+        if drop_flagged and (d.get("features") or {}).get("is_duplicate") is True:
+            counts["flagged_duplicate"] += 1
+            continue
+        counts["kept"] += 1
+        yield d
+
+
 # %%
 def get_location_fields(data, field):
     """Get field from location dictionary within list of dictionaries.
@@ -59,6 +137,8 @@ def create_df(data):
     """Creates a dataframe from the json data and lists
     created from the get_location_fields and
     get_feature_fields functions."""
+    # Compact job ad records back to dictionaries
+    data = [d.to_ojo() if isinstance(d, JobAd) else d for d in data]
     # Calling functions to get fields from dicts within list of dicts
     location_code = get_location_fields(data, "nuts_2_code")
     location_name = get_location_fields(data, "nuts_2_name")
@@ -95,7 +175,13 @@ def remove_cols(df):
     df.drop("features", axis=1, inplace=True)
     # Drop completely empty columns
     df.dropna(how="all", axis=1, inplace=True)
-    df.drop(["__version__", "duplicated", "data_source"], axis=1, inplace=True)
+    # Not all of these are kept (e.g. by compact job ads, or if empty)
+    df.drop(
+        ["__version__", "duplicated", "data_source"],
+        axis=1,
+        inplace=True,
+        errors="ignore",
+    )
 
 
 # %%
@@ -0,0 +1,215 @@
+# ---
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: -all
+#     comment_magics: true
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#       jupytext_version: 1.13.2
+#   kernelspec:
+#     display_name: ojo_local_indicators
+#     language: python
+#     name: ojo_local_indicators
+# ---
+
+# %% [markdown]
+# ### Daily vacancy counts
+#
+# Number of adverts per day by NUTS 2 region, `parent_sector`, `sector` and
+# skill cluster (`label_cluster_0`). Skill cluster "all" counts all adverts
+# (each once); the other clusters count the adverts mentioning them.
+#
+# The counts are stored as Parquet parts partitioned by month
+# (`daily_counts/month=yyyy-mm/{part}.parquet`). Ingestion writes a new part
+# for each batch of new adverts, so the same day and keys can be in several
+# parts: they are summed when read.
+#
+# `CountCube` answers range and groupby queries from prefix sums over days,
+# built the first time a set of columns is queried and kept, as are the
+# monthly and quarterly rollups, so a query only differences two columns.
+
+# %%
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from ojo_local_indicators.pipeline.skill_cube import ALL_ADVERTS, _as_list
+
+# %%
+# Dimensions of the daily counts (besides date)
+COUNT_DIMENSIONS = ["nuts_2_code", "parent_sector", "sector", "skill_cluster"]
+
+# Taxonomy level of the skill clusters
+SKILL_CLUSTER_LEVEL = "label_cluster_0"
+
+# Columns of the stored parts
+DAILY_COUNTS_SCHEMA = pa.schema(
+    [("date", pa.timestamp("ns"))]
+    + [(column, pa.string()) for column in COUNT_DIMENSIONS]
+    + [("adverts", pa.int64())]
+)
+
+
+# %%
+def build_daily_counts(adverts, skills=None):
+    """Daily counts from the flattened adverts (id, created, nuts_2_code,
+    parent_sector, sector) and skills (advert_id, label_cluster_0) tables.
+    Without skills only skill cluster "all" is counted."""
+    adverts = adverts.assign(
+        date=pd.to_datetime(adverts["created"].str[:10], format="%Y-%m-%d")
+    )
+    keys = ["date"] + COUNT_DIMENSIONS[:-1]
+    parts = [
+        adverts.groupby(keys, dropna=False)
+        .size()
+        .reset_index(name="adverts")
+        .assign(skill_cluster=ALL_ADVERTS)
+    ]
+    if skills is not None:
+        # Each cluster once per advert
+        presence = skills[["advert_id", SKILL_CLUSTER_LEVEL]].dropna()
+        presence = presence.drop_duplicates().join(
+            adverts.set_index("id")[keys], on="advert_id"
+        )
+        parts.append(
+            presence.groupby(keys + [SKILL_CLUSTER_LEVEL], dropna=False)
+            .size()
+            .reset_index(name="adverts")
+            .rename(columns={SKILL_CLUSTER_LEVEL: "skill_cluster"})
+        )
+    counts = pd.concat(parts, ignore_index=True)
+    counts = counts[counts["date"].notna()]
+    counts = counts[["date"] + COUNT_DIMENSIONS + ["adverts"]]
+    return counts.astype({"adverts": "int64"}).reset_index(drop=True)
+
+
+# %%
+def append_daily_counts(counts, part_name, store_dir):
+    """Writes daily counts as a new part of each month they cover."""
+    months = counts["date"].dt.strftime("%Y-%m")
+    for month, month_counts in counts.groupby(months):
+        month_dir = f"{store_dir}/daily_counts/month={month}"
+        os.makedirs(month_dir, exist_ok=True)
+        pq.write_table(
+            pa.Table.from_pandas(
+                month_counts, schema=DAILY_COUNTS_SCHEMA, preserve_index=False
+            ),
+            f"{month_dir}/{part_name}.parquet",
+        )
+
+
+# %%
+def read_daily_counts(store_dir, start=None, end=None):
+    """Reads the daily counts of the store between start and end (included,
+    yyyy-mm-dd), only opening the months needed. Parts are summed."""
+    filters = []
+    if start is not None:
+        filters.append(("month", ">=", str(start)[:7]))
+    if end is not None:
+        filters.append(("month", "<=", str(end)[:7]))
+    counts = pd.read_parquet(
+        f"{store_dir}/daily_counts",
+        columns=DAILY_COUNTS_SCHEMA.names,
+        filters=filters or None,
+    )
+    if start is not None:
+        counts = counts[counts["date"] >= pd.Timestamp(start)]
+    if end is not None:
+        counts = counts[counts["date"] <= pd.Timestamp(end)]
+    return (
+        counts.groupby(["date"] + COUNT_DIMENSIONS, dropna=False)["adverts"]
+        .sum()
+        .reset_index()
+    )
+
+
+# %%
+class CountCube:
+    """Range and groupby queries on daily counts (see build_daily_counts),
+    e.g.
+
+        cube = CountCube(read_daily_counts(store_dir))
+        cube.counts("2021-06-01", "2021-08-31", by=["nuts_2_code"])
+        cube.rollup("M", by=["sector"], skill_cluster="Education")
+
+    Queries count all adverts (skill cluster "all") unless skill_cluster is
+    in by or filtered on.
+    """
+
+    def __init__(self, counts):
+        self.daily = counts[counts["adverts"] > 0].reset_index(drop=True)
+        self.first = self.daily["date"].min()
+        self.last = self.daily["date"].max()
+        self.n_days = (self.last - self.first).days + 1
+        self._prefix_sums = {}
+        self._rollups = {}
+
+    def _get_prefix_sums(self, columns):
+        """Index of the combinations of the columns, and their counts before
+        each day (column k counts the k first days)."""
+        if columns not in self._prefix_sums:
+            grouped = self.daily.groupby(list(columns), dropna=False)
+            day = (self.daily["date"] - self.first).dt.days.to_numpy()
+            sums = np.zeros((grouped.ngroups, self.n_days + 1), dtype=np.int64)
+            np.add.at(
+                sums,
+                (grouped.ngroup().to_numpy(), day + 1),
+                self.daily["adverts"].to_numpy(),
+            )
+            self._prefix_sums[columns] = (grouped.size().index, sums.cumsum(axis=1))
+        return self._prefix_sums[columns]
+
+    def _day_range(self, start, end):
+        """Prefix sum columns bounding start to end (included)."""
+        lo = 0 if start is None else (pd.Timestamp(start) - self.first).days
+        hi = self.n_days if end is None else (pd.Timestamp(end) - self.first).days + 1
+        lo = min(max(lo, 0), self.n_days)
+        hi = min(max(hi, lo), self.n_days)
+        return lo, hi
+
+    def counts(self, start=None, end=None, by=(), **filters):
+        """Number of adverts between start and end (included, yyyy-mm-dd) for
+        each combination of the by columns (a series), or in total, where
+        each filter column has one of the values given."""
+        by = list(by)
+        if "skill_cluster" not in by and "skill_cluster" not in filters:
+            filters["skill_cluster"] = ALL_ADVERTS
+        columns = tuple(by + sorted(set(filters) - set(by)))
+        index, sums = self._get_prefix_sums(columns)
+        lo, hi = self._day_range(start, end)
+        totals = pd.Series(sums[:, hi] - sums[:, lo], index=index, name="adverts")
+        keys = index.to_frame(index=False)
+        mask = np.ones(len(keys), dtype=bool)
+        for column, values in filters.items():
+            mask &= keys[column].isin(_as_list(values)).to_numpy()
+        totals = totals[mask]
+        if not by:
+            return int(totals.sum())
+        return totals.groupby(level=by, dropna=False).sum()
+
+    def rollup(self, freq="M", by=(), **filters):
+        """Number of adverts per month ("M") or quarter ("Q") for each
+        combination of the by columns (see counts), as a df with the first
+        day of each period. Computed the first time and kept."""
+        key = (
+            freq,
+            tuple(by),
+            tuple(sorted((k, tuple(_as_list(v))) for k, v in filters.items())),
+        )
+        if key not in self._rollups:
+            parts = []
+            for period in pd.period_range(self.first, self.last, freq=freq):
+                counts = self.counts(period.start_time, period.end_time, by, **filters)
+                if by:
+                    counts = counts.reset_index()
+                else:
+                    counts = pd.DataFrame({"adverts": [counts]})
+                parts.append(counts.assign(period=period.start_time))
+            rollup = pd.concat(parts, ignore_index=True)
+            self._rollups[key] = rollup[["period"] + list(by) + ["adverts"]]
+        return self._rollups[key]
@@ -0,0 +1,196 @@
+# ---
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: -all
+#     comment_magics: true
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#       jupytext_version: 1.13.2
+#   kernelspec:
+#     display_name: ojo_local_indicators
+#     language: python
+#     name: ojo_local_indicators
+# ---
+
+# %% [markdown]
+# ### Flatten a data dump into adverts, skills and salary tables (Parquet)
+
+# %%
+# Import libraries
+import hashlib
+import os
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import ojo_local_indicators
+from ojo_local_indicators.getters.stream_data import iter_batches
+
+# %%
+# Set directory
+project_directory = ojo_local_indicators.PROJECT_DIR
+
+# Where flattened tables are stored (one folder per source dump)
+PATH_TO_TABLES = f"{project_directory}/outputs/data/tables"
+
+# Columns of each table and their types
+TABLE_SCHEMAS = {
+    "adverts": pa.schema(
+        [
+            ("id", pa.string()),
+            ("created", pa.string()),
+            ("job_title_raw", pa.string()),
+            ("job_location_raw", pa.string()),
+            ("company_raw", pa.string()),
+            ("sector", pa.string()),
+            ("parent_sector", pa.string()),
+            ("is_duplicate", pa.bool_()),
+            ("nuts_2_code", pa.string()),
+            ("nuts_2_name", pa.string()),
+        ]
+    ),
+    "skills": pa.schema(
+        [
+            ("advert_id", pa.string()),
+            ("preferred_label", pa.string()),
+            ("surface_form", pa.string()),
+            ("label_cluster_0", pa.string()),
+            ("label_cluster_1", pa.string()),
+            ("label_cluster_2", pa.string()),
+        ]
+    ),
+    "salaries": pa.schema(
+        [
+            ("advert_id", pa.string()),
+            ("raw_salary", pa.float64()),
+            ("raw_min_salary", pa.float64()),
+            ("raw_max_salary", pa.float64()),
+            ("raw_salary_unit", pa.string()),
+            ("raw_salary_currency", pa.string()),
+            ("min_annualised_salary", pa.float64()),
+            ("max_annualised_salary", pa.float64()),
+        ]
+    ),
+}
+
+# Columns taken from the top level of each advert
+ADVERT_COLUMNS = [
+    "created",
+    "job_title_raw",
+    "job_location_raw",
+    "company_raw",
+    "sector",
+    "parent_sector",
+]
+RAW_SALARY_COLUMNS = [
+    "raw_salary",
+    "raw_min_salary",
+    "raw_max_salary",
+    "raw_salary_unit",
+    "raw_salary_currency",
+]
+
+# File hashes computed so far, keyed by (path, size, modified time)
+_hashes = {}
+
+
+# %%
+def file_hash(file, chunk_size=1 << 20):
+    """Returns a short sha256 hash of the contents of a file."""
+    stat = os.stat(file)
+    key = (os.path.abspath(file), stat.st_size, stat.st_mtime_ns)
+    if key not in _hashes:
+        sha = hashlib.sha256()
+        with open(file, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                sha.update(chunk)
+        _hashes[key] = sha.hexdigest()[:16]
+    return _hashes[key]
+
+
+# %%
+def as_str(value):
+    """Ids are stored as strings (they are ints in some dumps)."""
+    return None if value is None else str(value)
+
+
+# %%
+def flatten_advert(advert):
+    """Flattens one advert dictionary into an advert row, a list of skill
+    rows and a salary row."""
+    features = advert.get("features") or {}
+    location = features.get("location") or {}
+    salary = features.get("salary") or {}
+    advert_id = as_str(advert.get("id"))
+    advert_row = {"id": advert_id}
+    advert_row.update({col: advert.get(col) for col in ADVERT_COLUMNS})
+    advert_row["is_duplicate"] = features.get("is_duplicate")
+    advert_row["nuts_2_code"] = location.get("nuts_2_code")
+    advert_row["nuts_2_name"] = location.get("nuts_2_name")
+    skill_rows = [
+        {
+            "advert_id": advert_id,
+            "preferred_label": skill.get("preferred_label"),
+            "surface_form": skill.get("surface_form"),
+            "label_cluster_0": skill.get("label_cluster_0"),
+            "label_cluster_1": skill.get("label_cluster_1"),
+            "label_cluster_2": skill.get("label_cluster_2"),
+        }
+        for skill in ((features.get("skills") or {}).get("skills") or [])
+    ]
+    salary_row = {"advert_id": advert_id}
+    salary_row.update({col: advert.get(col) for col in RAW_SALARY_COLUMNS})
+    salary_row["min_annualised_salary"] = salary.get("min_annualised_salary")
+    salary_row["max_annualised_salary"] = salary.get("max_annualised_salary")
+    return advert_row, skill_rows, salary_row
+
+
+# %%
+def flatten_to_parquet(file, out_dir, batch_size=50000):
+    """Streams a data dump and writes the adverts, skills and salaries
+    tables to out_dir, one batch of adverts at a time."""
+    os.makedirs(out_dir, exist_ok=True)
+    writers = {
+        table: pq.ParquetWriter(f"{out_dir}/{table}.parquet", schema)
+        for table, schema in TABLE_SCHEMAS.items()
+    }
+    try:
+        for batch in iter_batches(file, batch_size):
+            rows = {table: [] for table in TABLE_SCHEMAS}
+            for advert in batch:
+                advert_row, skill_rows, salary_row = flatten_advert(advert)
+                rows["adverts"].append(advert_row)
+                rows["skills"].extend(skill_rows)
+                rows["salaries"].append(salary_row)
+            for table, writer in writers.items():
+                writer.write_table(
+                    pa.Table.from_pylist(rows[table], schema=TABLE_SCHEMAS[table])
+                )
+    finally:
+        for writer in writers.values():
+            writer.close()
+    # Mark the tables as complete
+    Path(f"{out_dir}/_SUCCESS").touch()
+
+
+# %%
+def get_tables_dir(file):
+    """Returns the folder of flattened tables for a data dump, creating
+    the tables if they do not exist for this version of the dump."""
+    out_dir = f"{PATH_TO_TABLES}/{Path(file).stem}_{file_hash(file)}"
+    if not os.path.exists(f"{out_dir}/_SUCCESS"):
+        flatten_to_parquet(file, out_dir)
+    return out_dir
+
+
+# %%
+def read_table(file, table, columns=None):
+    """Reads a flattened table (adverts, skills or salaries) for a data dump,
+    only loading the columns given."""
+    if table not in TABLE_SCHEMAS:
+        raise KeyError(f"Unknown table {table}, choose from {list(TABLE_SCHEMAS)}")
+    return pd.read_parquet(f"{get_tables_dir(file)}/{table}.parquet", columns=columns)
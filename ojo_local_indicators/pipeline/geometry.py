@@ -0,0 +1,180 @@
+# ---
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: -all
+#     comment_magics: true
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#       jupytext_version: 1.13.2
+#   kernelspec:
+#     display_name: ojo_local_indicators
+#     language: python
+#     name: ojo_local_indicators
+# ---
+
+# %% [markdown]
+# ### NUTS 2 geometry store
+#
+# Reads the NUTS 2 boundaries shapefile once: reprojects it to EPSG:4326,
+# renames the columns, merges regions shown as one (the five London codes)
+# and dissolves them. The result is saved (GeoParquet) at several
+# simplification levels, in a folder named after a hash of the shapefile
+# and the merge rules, so a changed shapefile or rule builds a new one.
+# Geometries are also kept in memory once read.
+#
+# Levels are simplified region by region, so borders of neighbouring regions
+# can drift apart slightly at the coarser levels.
+#
+# For web maps the geometry is also exported as quantised TopoJSON, where
+# borders shared by neighbouring regions are stored (and simplified) once.
+# One file is shared by all maps, which load it by URL and join their
+# values to it in the browser (see `uk_wide.create_nuts_map_divergent`).
+
+# %%
+import hashlib
+import json
+import os
+import shutil
+
+import geopandas as gpd
+import topojson as tp
+
+import ojo_local_indicators
+from ojo_local_indicators.pipeline.flatten_data import file_hash
+
+# %%
+# Set directory
+project_directory = ojo_local_indicators.PROJECT_DIR
+
+# Where the processed geometries are stored
+PATH_TO_GEOMETRY = f"{project_directory}/outputs/data/geometry"
+
+# Columns of the NUTS 2 (January 2018) boundaries and their new names
+NUTS_COLUMNS = {"nuts218cd": "Nuts 2", "nuts218nm": "Nuts 2 region"}
+
+# Regions shown as one: code of the merged region, its name and the codes merged
+NUTS_MERGES = {
+    "UKI": {"name": "London", "codes": ["UKI3", "UKI4", "UKI5", "UKI6", "UKI7"]},
+}
+
+# Simplification tolerance (degrees) of each level kept, None for full resolution
+SIMPLIFY_LEVELS = {"full": None, "medium": 0.001, "low": 0.005}
+
+# Name of the regions object in the TopoJSON
+TOPOJSON_OBJECT = "nuts_2"
+
+# Grid size the TopoJSON coordinates are quantised to (along each axis)
+TOPOJSON_QUANTIZATION = 100000
+
+# Shapefile parts hashed to key the store
+SHAPEFILE_PARTS = [".shp", ".shx", ".dbf", ".prj"]
+
+# Geometries read so far, keyed by (store key, level)
+_geometries = {}
+
+
+# %%
+def merge_codes(codes, merges=NUTS_MERGES):
+    """Series of NUTS 2 codes with the merged codes replaced by the code of
+    the region they are merged into (e.g. to match indicator values to the
+    merged geometries)."""
+    merged = {code: new for new, rule in merges.items() for code in rule["codes"]}
+    return codes.replace(merged)
+
+
+# %%
+def geometry_key(shapefile, merges=NUTS_MERGES):
+    """Hash of the shapefile parts and the merge rules."""
+    base, _ = os.path.splitext(shapefile)
+    hashes = [
+        file_hash(base + part)
+        for part in SHAPEFILE_PARTS
+        if os.path.exists(base + part)
+    ]
+    rules = json.dumps(merges, sort_keys=True)
+    return hashlib.sha256(" ".join(hashes + [rules]).encode()).hexdigest()[:16]
+
+
+# %%
+def build_nuts_geometry(shapefile, merges=NUTS_MERGES):
+    """Reads the shapefile as EPSG:4326 with the NUTS 2 code and name, and
+    dissolves the merged regions."""
+    geo = gpd.read_file(shapefile).to_crs(epsg=4326)
+    geo = geo.rename(columns=NUTS_COLUMNS)[list(NUTS_COLUMNS.values()) + ["geometry"]]
+    for code, rule in merges.items():
+        merged = geo["Nuts 2"].isin(rule["codes"])
+        geo.loc[merged, "Nuts 2"] = code
+        geo.loc[merged, "Nuts 2 region"] = rule["name"]
+    return geo.dissolve(by=["Nuts 2", "Nuts 2 region"]).reset_index()
+
+
+# %%
+def write_nuts_geometry(geo, store_dir, levels=SIMPLIFY_LEVELS):
+    """Saves the geometry at each simplification level."""
+    os.makedirs(store_dir, exist_ok=True)
+    for level, tolerance in levels.items():
+        simplified = geo
+        if tolerance is not None:
+            simplified = geo.assign(
+                geometry=geo.simplify(tolerance, preserve_topology=True)
+            )
+        path = f"{store_dir}/nuts_2_{level}.parquet"
+        simplified.to_parquet(path + ".tmp", index=False)
+        os.replace(path + ".tmp", path)
+
+
+# %%
+def get_nuts_geometry(
+    shapefile, level="full", merges=NUTS_MERGES, store_dir=PATH_TO_GEOMETRY
+):
+    """NUTS 2 geometry (GeoDataFrame with Nuts 2, Nuts 2 region and geometry
+    columns) at a simplification level, building the store for the shapefile
+    and merge rules the first time."""
+    key = geometry_key(shapefile, merges)
+    if (key, level) not in _geometries:
+        path = f"{store_dir}/{key}/nuts_2_{level}.parquet"
+        if not os.path.exists(path):
+            write_nuts_geometry(
+                build_nuts_geometry(shapefile, merges), f"{store_dir}/{key}"
+            )
+        _geometries[(key, level)] = gpd.read_parquet(path)
+    return _geometries[(key, level)].copy()
+
+
+# %%
+def get_nuts_topojson(
+    shapefile,
+    simplify=SIMPLIFY_LEVELS["medium"],
+    quantization=TOPOJSON_QUANTIZATION,
+    merges=NUTS_MERGES,
+    store_dir=PATH_TO_GEOMETRY,
+):
+    """Path of the NUTS 2 geometry as quantised TopoJSON (simplify is the
+    tolerance in degrees, None to keep all points), building it from the
+    full resolution geometry the first time."""
+    key = geometry_key(shapefile, merges)
+    path = f"{store_dir}/{key}/nuts_2_{simplify}_{quantization}.topo.json"
+    if not os.path.exists(path):
+        topology = tp.Topology(
+            get_nuts_geometry(shapefile, "full", merges, store_dir),
+            prequantize=quantization,
+            toposimplify=simplify or False,
+            object_name=TOPOJSON_OBJECT,
+        )
+        with open(path + ".tmp", "w") as topo_file:
+            topo_file.write(topology.to_json())
+        os.replace(path + ".tmp", path)
+    return path
+
+
+# %%
+def export_nuts_topojson(shapefile, path, **kwargs):
+    """Copies the NUTS 2 TopoJSON (see get_nuts_topojson) to path, e.g. next
+    to the maps using it, unless it is already there."""
+    topojson_path = get_nuts_topojson(shapefile, **kwargs)
+    if not os.path.exists(path) or file_hash(path) != file_hash(topojson_path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        shutil.copyfile(topojson_path, path)
+    return path
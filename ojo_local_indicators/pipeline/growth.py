@@ -0,0 +1,176 @@
+# ---
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: -all
+#     comment_magics: true
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#       jupytext_version: 1.13.2
+#   kernelspec:
+#     display_name: ojo_local_indicators
+#     language: python
+#     name: ojo_local_indicators
+# ---
+
+# %% [markdown]
+# ### Growth between periods
+#
+# Compares the number of adverts of each value of one or several dimensions
+# (NUTS 2 region, industry, occupation, skill group...) between date windows,
+# e.g. "June to August" against "September to November".
+#
+# Windows are (name, first day, last day) tuples, with None for an open end.
+# Counts are normalised by the number of days of each window covered by the
+# data (windows are clipped to the first and last advert dates) and shares
+# are out of all the adverts in the window, so both denominators come from
+# the data. Percent change and share difference compare the last window to
+# the first one.
+#
+# The frame holds one row per advert (and value, for dimensions with several
+# values per advert such as skills), or pre-aggregated counts in a count
+# column (e.g. the skill cube). Windows are assigned once and each dimension
+# is counted with a groupby on categorical codes.
+
+# %%
+import numpy as np
+import pandas as pd
+
+
+# %%
+def _as_dates(dates):
+    """Dates (strings or datetimes) as a datetime series of days."""
+    return pd.to_datetime(pd.Series(dates)).dt.normalize()
+
+
+# %%
+def _bounds(windows):
+    """First and last day timestamps of each window (None for open ends)."""
+    return [
+        (
+            None if start is None else pd.Timestamp(start),
+            None if end is None else pd.Timestamp(end),
+        )
+        for _, start, end in windows
+    ]
+
+
+# %%
+def assign_windows(dates, windows):
+    """Categorical of the name of the window each date is in (NaN when in
+    none; first window wins when they overlap)."""
+    dates = _as_dates(dates).to_numpy()
+    codes = np.full(len(dates), -1)
+    for i, (start, end) in enumerate(_bounds(windows)):
+        in_window = codes == -1
+        if start is not None:
+            in_window &= dates >= start.to_datetime64()
+        if end is not None:
+            in_window &= dates <= end.to_datetime64()
+        codes[in_window] = i
+    return pd.Categorical.from_codes(codes, categories=[w[0] for w in windows])
+
+
+# %%
+def window_days(dates, windows):
+    """Number of days of each window between the first and last dates."""
+    dates = _as_dates(dates)
+    first, last = dates.min(), dates.max()
+    days = {}
+    for (name, _, _), (start, end) in zip(windows, _bounds(windows)):
+        start = first if start is None else max(start, first)
+        end = last if end is None else min(end, last)
+        days[name] = max((end - start).days + 1, 0)
+    return pd.Series(days)
+
+
+# %%
+def window_totals(window, count=None):
+    """Number of adverts in each window, from the windows assigned to the
+    adverts (see assign_windows) and their counts (one each by default)."""
+    weights = pd.Series(
+        1 if count is None else np.asarray(count), index=range(len(window))
+    )
+    return weights.groupby(window, observed=False).sum()
+
+
+# %%
+def _growth(values, window, days, totals, count=None):
+    """Growth table of one dimension (series, or df of several columns)."""
+    names = list(window.categories)
+    keys = (
+        [values[column] for column in values]
+        if isinstance(values, pd.DataFrame)
+        else [values]
+    )
+    # Keys as columns (a list of keys as long as the frame would be taken
+    # as one key)
+    keys = pd.DataFrame(
+        {i: pd.Categorical(key) for i, key in enumerate(keys + [window])}
+    )
+    keys["count"] = 1 if count is None else np.asarray(count)
+    counts = (
+        keys.groupby(list(keys.columns[:-1]), observed=True)["count"]
+        .sum()
+        .unstack(-1, fill_value=0)
+        .reindex(columns=names, fill_value=0)
+    )
+    counts.index.names = (
+        list(values.columns) if isinstance(values, pd.DataFrame) else [values.name]
+    )
+    per_day = counts / days[names]
+    share = counts / totals[names] * 100
+    table = pd.concat(
+        [
+            counts.add_suffix(" count"),
+            per_day.add_suffix(" per day"),
+            share.add_suffix(" percent vacancies"),
+        ],
+        axis=1,
+    )
+    table["Percent change"] = (per_day[names[-1]] / per_day[names[0]] - 1) * 100
+    table["Percent share difference"] = share[names[-1]] - share[names[0]]
+    return table
+
+
+# %%
+def growth_tables(frame, dimensions, windows, date="created", count=None, adverts=None):
+    """Growth between windows of the values of each dimension (a column, or
+    a list of columns) of a frame, assigning windows once. adverts is the df
+    of all adverts (date and count columns as in frame) the days and shares
+    come from, frame itself by default (when it has one row per advert).
+
+    Returns a dictionary of dimension to df indexed by value, with for each
+    window the count, count per day and percent of adverts (percent
+    vacancies), then "Percent change" (per day) and "Percent share
+    difference" (percentage points) from the first to the last window."""
+    frame = frame.reset_index(drop=True)
+    window = assign_windows(frame[date], windows)
+    weights = None if count is None else frame[count]
+    if adverts is None:
+        days = window_days(frame[date], windows)
+        totals = window_totals(window, weights)
+    else:
+        days = window_days(adverts[date], windows)
+        totals = window_totals(
+            assign_windows(adverts[date], windows),
+            None if count is None else adverts[count],
+        )
+    tables = {}
+    for dimension in dimensions:
+        if isinstance(dimension, (list, tuple)):
+            dimension = tuple(dimension)
+            values = frame[list(dimension)]
+        else:
+            values = frame[dimension]
+        tables[dimension] = _growth(values, window, days, totals, weights)
+    return tables
+
+
+# %%
+def period_growth(frame, dimension, windows, date="created", count=None, adverts=None):
+    """Growth between windows of the values of one dimension (see
+    growth_tables)."""
+    tables = growth_tables(frame, [dimension], windows, date, count, adverts)
+    return next(iter(tables.values()))
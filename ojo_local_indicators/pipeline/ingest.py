@@ -0,0 +1,268 @@
+# ---
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: -all
+#     comment_magics: true
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#       jupytext_version: 1.13.2
+#   kernelspec:
+#     display_name: ojo_local_indicators
+#     language: python
+#     name: ojo_local_indicators
+# ---
+
+# %% [markdown]
+# ### Incremental ingestion of job ads
+#
+# Keeps a local store of job ads (JSON lines plus flattened Parquet parts
+# and daily counts, see `count_cube`) and a watermark of the last `created`
+# date ingested. Each run only fetches the upstream cache windows (see
+# `get_valid_cache_dates`) that overlap or follow the watermark, always
+# fetching the latest one again as it can still get adverts, and appends the
+# adverts not stored yet (by id, from the adverts table of the store).
+#
+# Daily counts are kept per part (same name as the adverts part), so parts
+# without counts (ingested before they were kept) are found and counted.
+#
+# `python ojo_local_indicators/pipeline/ingest.py --until 22-11-2021`
+
+# %%
+import json
+import os
+from datetime import date, datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import typer
+
+import ojo_local_indicators
+from ojo_local_indicators import logger
+from ojo_local_indicators.getters.job_ads import get_job_ads, remote_backend
+from ojo_local_indicators.pipeline.count_cube import (
+    CountCube,
+    append_daily_counts,
+    build_daily_counts,
+    read_daily_counts,
+)
+from ojo_local_indicators.pipeline.flatten_data import (
+    as_str,
+    flatten_advert,
+    TABLE_SCHEMAS,
+)
+
+# %%
+# Set directory
+project_directory = ojo_local_indicators.PROJECT_DIR
+
+# Where the store lives
+PATH_TO_STORE = f"{project_directory}/outputs/data/store"
+
+# First day of OJO data used in the indicators (dd-mm-yyyy)
+FIRST_DATE = "07-06-2021"
+
+DATE_FORMAT = "%d-%m-%Y"
+
+
+# %%
+def read_watermark(store_dir=PATH_TO_STORE):
+    """Returns the watermark of the store (last created date and number of
+    adverts), or None if nothing has been ingested yet."""
+    path = f"{store_dir}/watermark.json"
+    if not os.path.exists(path):
+        return None
+    with open(path) as json_file:
+        return json.load(json_file)
+
+
+# %%
+def write_watermark(watermark, store_dir=PATH_TO_STORE):
+    """Saves the watermark of the store."""
+    with open(f"{store_dir}/watermark.json.tmp", "w") as json_file:
+        json.dump(watermark, json_file)
+    os.replace(f"{store_dir}/watermark.json.tmp", f"{store_dir}/watermark.json")
+
+
+# %%
+def _as_date(day):
+    """Date of a dd-mm-yyyy string."""
+    return datetime.strptime(day, DATE_FORMAT).date()
+
+
+# %%
+def cache_windows(cache_dates=None):
+    """(start, end) windows of the upstream job ads cache, in order, from
+    get_valid_cache_dates (or the dates given): either the dates bounding
+    the windows (dd-mm-yyyy) or the (start, end) windows."""
+    if cache_dates is None:
+        from ojd_daps.dqa.data_getters import get_valid_cache_dates
+
+        cache_dates = get_valid_cache_dates()
+    cache_dates = list(cache_dates)
+    if cache_dates and isinstance(cache_dates[0], (tuple, list)):
+        windows = [tuple(window) for window in cache_dates]
+    else:
+        dates = sorted(set(cache_dates), key=_as_date)
+        windows = list(zip(dates[:-1], dates[1:]))
+    return sorted(windows, key=lambda window: _as_date(window[0]))
+
+
+# %%
+def get_windows(since, until, cache_dates=None):
+    """Windows of the upstream cache (see cache_windows) overlapping since
+    to until (dd-mm-yyyy)."""
+    since, until = _as_date(since), _as_date(until)
+    return [
+        (start, end)
+        for start, end in cache_windows(cache_dates)
+        if _as_date(end) >= since and _as_date(start) <= until
+    ]
+
+
+# %%
+def stored_ids(store_dir=PATH_TO_STORE):
+    """Set of the ids (as strings) of the adverts in the store, read from the
+    id column of the adverts table."""
+    path = f"{store_dir}/adverts"
+    if not os.path.exists(path):
+        return set()
+    return set(pq.read_table(path, columns=["id"]).column("id").to_pylist())
+
+
+# %%
+def append_to_store(job_ads, part_name, store_dir=PATH_TO_STORE):
+    """Appends adverts to the JSON lines store and writes them as a new
+    part of each flattened table (store_dir/{table}/{part_name}.parquet)
+    and of the daily counts."""
+    rows = {table: [] for table in TABLE_SCHEMAS}
+    with open(f"{store_dir}/job_ads.jsonl", "a") as json_file:
+        for job_ad in job_ads:
+            json_file.write(json.dumps(job_ad) + "\n")
+            advert_row, skill_rows, salary_row = flatten_advert(job_ad)
+            rows["adverts"].append(advert_row)
+            rows["skills"].extend(skill_rows)
+            rows["salaries"].append(salary_row)
+    for table, schema in TABLE_SCHEMAS.items():
+        os.makedirs(f"{store_dir}/{table}", exist_ok=True)
+        pq.write_table(
+            pa.Table.from_pylist(rows[table], schema=schema),
+            f"{store_dir}/{table}/{part_name}.parquet",
+        )
+    append_daily_counts(
+        build_daily_counts(
+            pd.DataFrame(rows["adverts"], columns=TABLE_SCHEMAS["adverts"].names),
+            pd.DataFrame(rows["skills"], columns=TABLE_SCHEMAS["skills"].names),
+        ),
+        part_name,
+        store_dir,
+    )
+
+
+# %%
+def ingest(
+    until=None, backend=remote_backend, store_dir=PATH_TO_STORE, cache_dates=None
+):
+    """Fetches the job ads of the cache windows from the watermark (up to
+    until, dd-mm-yyyy, default today) and appends the new ones to the store.
+    The latest window is always fetched again. Returns the updated
+    watermark."""
+    os.makedirs(store_dir, exist_ok=True)
+    watermark = read_watermark(store_dir) or {"last_created": None, "n_adverts": 0}
+    if watermark["last_created"] is None:
+        since = FIRST_DATE
+    else:
+        # Start on the watermark day: adverts from that day may have arrived late
+        since = datetime.strptime(watermark["last_created"], "%Y-%m-%d").strftime(
+            DATE_FORMAT
+        )
+    until = until or date.today().strftime(DATE_FORMAT)
+    windows = get_windows(since, until, cache_dates)
+    if not windows:
+        return watermark
+    # Only keep adverts not already stored (or repeated across windows)
+    seen = stored_ids(store_dir)
+    new_ads = []
+    for job_ad in get_job_ads(windows, backend, refresh=windows[-1:]):
+        job_id = as_str(job_ad["id"])
+        if job_id not in seen:
+            seen.add(job_id)
+            new_ads.append(job_ad)
+    if new_ads:
+        # Runs can fetch the same windows, so parts are also named by run time
+        part_name = f"{windows[0][0]}_{windows[-1][1]}_{datetime.now():%Y%m%d%H%M%S}"
+        # Parts stored before the counts were kept are counted first
+        backfill_daily_counts(store_dir)
+        append_to_store(new_ads, part_name, store_dir)
+        last_created = max(job_ad["created"][:10] for job_ad in new_ads)
+        if watermark["last_created"] is not None:
+            last_created = max(last_created, watermark["last_created"])
+        watermark = {
+            "last_created": last_created,
+            "n_adverts": watermark["n_adverts"] + len(new_ads),
+        }
+        write_watermark(watermark, store_dir)
+    logger.info(
+        f"Ingested {len(new_ads)} new adverts from {since} to {until} "
+        f"(watermark {watermark['last_created']})"
+    )
+    return watermark
+
+
+# %%
+def read_store_table(table, columns=None, store_dir=PATH_TO_STORE):
+    """Reads a flattened table (adverts, skills or salaries) of the store,
+    only loading the columns given."""
+    return pd.read_parquet(f"{store_dir}/{table}", columns=columns)
+
+
+# %%
+def _part_names(directory):
+    """Names of the Parquet parts in a folder (and its month folders)."""
+    return {
+        file[: -len(".parquet")]
+        for _, _, files in os.walk(directory)
+        for file in files
+        if file.endswith(".parquet")
+    }
+
+
+# %%
+def backfill_daily_counts(store_dir=PATH_TO_STORE):
+    """Builds the daily counts of the stored parts that have none (parts
+    ingested before the counts were kept), from their flattened tables.
+    Returns the names of the parts counted."""
+    missing = sorted(
+        _part_names(f"{store_dir}/adverts") - _part_names(f"{store_dir}/daily_counts")
+    )
+    for part_name in missing:
+        counts = build_daily_counts(
+            pd.read_parquet(f"{store_dir}/adverts/{part_name}.parquet"),
+            pd.read_parquet(f"{store_dir}/skills/{part_name}.parquet"),
+        )
+        append_daily_counts(counts, part_name, store_dir)
+    if missing:
+        logger.info(f"Built the daily counts of {len(missing)} stored parts")
+    return missing
+
+
+# %%
+def read_count_cube(start=None, end=None, store_dir=PATH_TO_STORE):
+    """Daily counts of the store between start and end (yyyy-mm-dd) as a
+    CountCube, first building those of any part without them (see
+    backfill_daily_counts)."""
+    backfill_daily_counts(store_dir)
+    return CountCube(read_daily_counts(store_dir, start, end))
+
+
+# %%
+def main(until: str = typer.Option(None, help="Last date (dd-mm-yyyy)")):
+    """Ingests the job ads created since the last run."""
+    ingest(until)
+
+
+# %%
+if __name__ == "__main__":
+    typer.run(main)
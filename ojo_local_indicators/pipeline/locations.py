@@ -0,0 +1,172 @@
+# ---
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: -all
+#     comment_magics: true
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#       jupytext_version: 1.13.2
+#   kernelspec:
+#     display_name: ojo_local_indicators
+#     language: python
+#     name: ojo_local_indicators
+# ---
+
+# %%
+# Import libraries
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from ojo_local_indicators import config
+
+
+# %% [markdown]
+# ### NUTS 2 fixes
+
+# %%
+def get_nuts_2_names(data):
+    """Maps each nuts 2 code to its (first seen) nuts 2 name
+    in list of dictionaries."""
+    names = {}
+    for d in data:
+        location = (d.get("features") or {}).get("location") or {}
+        code = location.get("nuts_2_code")
+        if code and location.get("nuts_2_name") and code not in names:
+            names[code] = location["nuts_2_name"]
+    return names
+
+
+# %%
+def build_fix_lookup(fixes, names):
+    """Creates a dictionary mapping job_location_raw to the corrected
+    (nuts 2 code, nuts 2 name) from the fixes df (job_location_raw, Code)."""
+    return {
+        raw: (code, names.get(code))
+        for raw, code in zip(fixes["job_location_raw"], fixes["Code"])
+    }
+
+
+# %%
+def read_fix_lookup(file, data):
+    """Reads the nuts 2 fixes spreadsheet and creates the fix lookup,
+    taking the nuts 2 names from the list of dictionaries."""
+    fixes = pd.read_excel(file)
+    return build_fix_lookup(fixes, get_nuts_2_names(data))
+
+
+# %%
+def apply_location_fixes(data, fix_lookup):
+    """Updates nuts 2 code and name in place in list of dictionaries
+    where job_location_raw is in the fix lookup.
+    Returns the count of adverts touched per job_location_raw."""
+    touched = Counter()
+    for d in data:
+        fix = fix_lookup.get(d.get("job_location_raw"))
+        location = (d.get("features") or {}).get("location")
+        if fix is not None and location is not None:
+            location["nuts_2_code"] = fix[0]
+            location["nuts_2_name"] = fix[1]
+            touched[d["job_location_raw"]] += 1
+    return touched
+
+
+# %%
+def apply_location_fixes_df(df, fix_lookup):
+    """Updates nuts_2_code and nuts_2_name cols in place in df (see create_df)
+    where job_location_raw is in the fix lookup.
+    Returns the count of adverts touched per job_location_raw."""
+    codes = {raw: fix[0] for raw, fix in fix_lookup.items()}
+    names = {raw: fix[1] for raw, fix in fix_lookup.items()}
+    to_fix = df["job_location_raw"].isin(codes.keys())
+    df.loc[to_fix, "nuts_2_code"] = df.loc[to_fix, "job_location_raw"].map(codes)
+    df.loc[to_fix, "nuts_2_name"] = df.loc[to_fix, "job_location_raw"].map(names)
+    return Counter(df.loc[to_fix, "job_location_raw"].value_counts().to_dict())
+
+
+# %% [markdown]
+# ### Area splits
+
+# %%
+# Name of the area holding adverts not in any named area
+REST_OF_UK = "Rest of UK"
+
+
+# %%
+def area_ids(data):
+    """Set of advert ids in list of dictionaries."""
+    return {d["id"] for d in data if "id" in d}
+
+
+# %%
+def partition_areas(data, areas, rest=REST_OF_UK):
+    """Splits adverts into named areas in one pass, where areas maps each
+    area name to its advert ids (see area_ids). Adverts not in any area
+    go to rest. Returns a dictionary of area name to list of adverts."""
+    area_of_id = {}
+    for name, ids in reversed(list(areas.items())):  # First area wins
+        area_of_id.update(dict.fromkeys(ids, name))
+    split = {name: [] for name in areas}
+    split[rest] = []
+    for d in data:
+        split[area_of_id.get(d.get("id"), rest)].append(d)
+    return split
+
+
+# %%
+def area_filter(area):
+    """Include and exclude terms of an area (dictionary with include and/or
+    exclude lists of place names) as lower case sets."""
+    return {
+        kind: frozenset(term.strip().lower() for term in area.get(kind) or [])
+        for kind in ("include", "exclude")
+    }
+
+
+# %%
+def get_area_filter(name):
+    """area_filter of an area in the areas section of the base config."""
+    return area_filter(config["areas"][name])
+
+
+# %%
+def in_area(job_location_raw, terms):
+    """Whether a job_location_raw is in an area (see area_filter): one of its
+    comma separated parts is an include term (or there are none) and none
+    is an exclude term. Missing locations are not in any area."""
+    if not isinstance(job_location_raw, str):
+        return False
+    parts = {part.strip() for part in job_location_raw.lower().split(",")}
+    if terms["include"] and parts.isdisjoint(terms["include"]):
+        return False
+    return parts.isdisjoint(terms["exclude"])
+
+
+# %%
+def filter_area(data, terms):
+    """Adverts in list of dictionaries whose job_location_raw is in an area
+    (see in_area)."""
+    return [d for d in data if in_area(d.get("job_location_raw"), terms)]
+
+
+# %%
+def in_area_series(locations, terms):
+    """Boolean series of whether each job_location_raw in a series is in an
+    area (see in_area), testing each distinct location once."""
+    codes, uniques = pd.factorize(locations)
+    in_unique = np.array([in_area(location, terms) for location in uniques] + [False])
+    return pd.Series(in_unique[codes], index=locations.index)
+
+
+# %%
+def relabel_nuts(data, code, name):
+    """Sets nuts 2 code and name in place for all adverts with a location."""
+    for d in data:
+        location = (d.get("features") or {}).get("location")
+        if location is not None:
+            location["nuts_2_code"] = code
+            location["nuts_2_name"] = name
+    return data
@@ -0,0 +1,161 @@
+# ---
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: -all
+#     comment_magics: true
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#       jupytext_version: 1.13.2
+#   kernelspec:
+#     display_name: ojo_local_indicators
+#     language: python
+#     name: ojo_local_indicators
+# ---
+
+# %% [markdown]
+# ### Batch NUTS 2 maps
+#
+# Renders a diverging map (see `uk_wide.create_nuts_map_divergent`) of each
+# indicator of a wide table keyed by NUTS 2 code, in a process pool. The
+# geometry is loaded once: html maps load the regions from a TopoJSON file
+# shared by all maps (written next to them) and only embed their values;
+# for png maps the geometry is sent once to each worker.
+#
+# A manifest of the maps saved (indicator, format, path and render time in
+# seconds) is written next to them as `manifest.json`.
+
+# %%
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from altair_saver import save
+
+from ojo_local_indicators import logger
+from ojo_local_indicators.pipeline.geometry import (
+    export_nuts_topojson,
+    get_nuts_geometry,
+)
+from ojo_local_indicators.pipeline.uk_wide import create_nuts_map_divergent
+
+# %%
+# Colours of the diverging maps (decline, no change, growth)
+DIVERGENT_COLOURS = ["#18A48C", "white", "#9A1BBE"]
+
+# TopoJSON file shared by the html maps of a folder
+TOPOJSON_FILE = "nuts_2.topo.json"
+
+# Geometry (Nuts 2 and geometry columns) for the png maps of a worker
+_geometry = None
+
+
+# %%
+def _init_worker(geometry):
+    """Keeps the geometry in the worker for the maps it renders."""
+    global _geometry
+    _geometry = geometry
+
+
+# %%
+def map_file_name(indicator):
+    """File name (without extension) of the map of an indicator."""
+    return re.sub(r"[^a-z0-9]+", "_", indicator.lower()).strip("_")
+
+
+# %%
+def check_file_names(indicators):
+    """Raises a ValueError if the maps of several indicators would have the
+    same file name (e.g. "Percent change" and "percent_change"), as they
+    would overwrite each other."""
+    names = {}
+    for indicator in indicators:
+        names.setdefault(map_file_name(indicator), []).append(indicator)
+    clashes = {name: found for name, found in names.items() if len(found) > 1}
+    if clashes:
+        raise ValueError(f"Indicators with the same map file name: {clashes}")
+
+
+# %%
+def render_map(job):
+    """Renders and saves one map from a job (indicator, values with Nuts 2,
+    Nuts 2 region and indicator columns, colours, format, path). Returns its
+    manifest entry."""
+    start = time.perf_counter()
+    indicator = job["indicator"]
+    values = job["values"]
+    if job["format"] == "html":
+        data, topojson_url = values, TOPOJSON_FILE
+    else:
+        data, topojson_url = _geometry.merge(values, how="left", on="Nuts 2"), None
+    chart = create_nuts_map_divergent(
+        data,
+        indicator,
+        "Nuts 2 region",
+        job["colours"],
+        values[indicator].min(),
+        values[indicator].max(),
+        "descending",
+        0,
+        topojson_url=topojson_url,
+    )
+    save(chart, job["path"])
+    return {
+        "indicator": indicator,
+        "format": job["format"],
+        "path": job["path"],
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+# %%
+def render_maps(
+    indicators,
+    shapefile,
+    out_dir,
+    formats=("html",),
+    key="Nuts 2",
+    colours=DIVERGENT_COLOURS,
+    max_workers=None,
+):
+    """Renders a map of each indicator (column) of a wide table with a key
+    column of NUTS 2 codes (merged as in the geometry, see
+    geometry.merge_codes) to out_dir, in each format (html and/or png).
+    Returns the manifest as a df."""
+    start = time.perf_counter()
+    indicators = indicators.rename(columns={key: "Nuts 2"})
+    indicators = indicators.drop(columns="Nuts 2 region", errors="ignore")
+    check_file_names(indicators.columns.drop("Nuts 2"))
+    os.makedirs(out_dir, exist_ok=True)
+    geometry = get_nuts_geometry(shapefile, level="medium")
+    table = pd.DataFrame(geometry[["Nuts 2", "Nuts 2 region"]]).merge(
+        indicators, how="left", on="Nuts 2"
+    )
+    if "html" in formats:
+        export_nuts_topojson(shapefile, f"{out_dir}/{TOPOJSON_FILE}")
+    jobs = [
+        {
+            "indicator": indicator,
+            "values": table[["Nuts 2", "Nuts 2 region", indicator]],
+            "colours": colours,
+            "format": fmt,
+            "path": f"{out_dir}/{map_file_name(indicator)}.{fmt}",
+        }
+        for indicator in indicators.columns.drop("Nuts 2")
+        for fmt in formats
+    ]
+    # Only send the geometry to the workers if they need it
+    worker_geometry = geometry[["Nuts 2", "geometry"]] if "png" in formats else None
+    with ProcessPoolExecutor(
+        max_workers, initializer=_init_worker, initargs=(worker_geometry,)
+    ) as executor:
+        manifest = pd.DataFrame(list(executor.map(render_map, jobs)))
+    manifest.to_json(f"{out_dir}/manifest.json", orient="records", indent=1)
+    logger.info(
+        f"Rendered {len(manifest)} maps to {out_dir} "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+    return manifest
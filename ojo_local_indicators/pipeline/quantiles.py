@@ -0,0 +1,124 @@
+# ---
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: -all
+#     comment_magics: true
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#       jupytext_version: 1.13.2
+#   kernelspec:
+#     display_name: ojo_local_indicators
+#     language: python
+#     name: ojo_local_indicators
+# ---
+
+# %% [markdown]
+# ### Salary quantile sketches
+#
+# `SalarySketch` counts salaries in logarithmic bins (as in DDSketch) instead
+# of keeping every value. Bin i holds the values in (gamma^(i-1), gamma^i],
+# gamma = (1 + a) / (1 - a), and is represented by a value within a relative
+# error a of all of them. So any quantile is within a relative error a
+# (1% by default) of `np.quantile` on the same values, whatever their
+# number. Salaries from £1 to £10m fit in at most ~800 bins.
+#
+# Sketches with the same accuracy can be merged (e.g. partial aggregates
+# computed in parallel) and give the same result as a single sketch.
+
+# %%
+import math
+
+# %%
+# Default relative error of the quantiles
+RELATIVE_ACCURACY = 0.01
+
+
+# %%
+class SalarySketch:
+    """Mergeable sketch of the quantiles of positive values (e.g. salaries).
+    Values <= 0 are counted as 0."""
+
+    __slots__ = ("relative_accuracy", "_log_gamma", "bins", "zero_count", "count")
+
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(gamma)
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __repr__(self):
+        return f"SalarySketch(count={self.count}, median={self.median()})"
+
+    def add(self, value):
+        """Adds one value to the sketch."""
+        if value > 0:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            self.bins[index] = self.bins.get(index, 0) + 1
+        else:
+            self.zero_count += 1
+        self.count += 1
+
+    def update(self, values):
+        """Adds several values to the sketch."""
+        for value in values:
+            self.add(value)
+        return self
+
+    def merge(self, other):
+        """Adds the values counted in another sketch (with the same
+        relative accuracy) to this one."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Can only merge sketches with the same accuracy")
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        return self
+
+    def _bin_value(self, index):
+        """Value representing bin index (within the relative accuracy of
+        every value in the bin)."""
+        return math.exp(index * self._log_gamma) * (1 - self.relative_accuracy)
+
+    def _values_at_ranks(self, ranks):
+        """Approximate values of rank (0 = smallest) for ascending ranks."""
+        values = []
+        seen = self.zero_count
+        bins = iter(sorted(self.bins.items()))
+        index = None
+        for rank in ranks:
+            if rank < self.zero_count:
+                values.append(0)
+                continue
+            while seen <= rank:
+                index, count = next(bins)
+                seen += count
+            values.append(self._bin_value(index))
+        return values
+
+    def quantile(self, q):
+        """Approximate q quantile (interpolated between ranks as in
+        np.quantile), None if the sketch is empty."""
+        if not self.count:
+            return None
+        position = q * (self.count - 1)
+        lower, upper = self._values_at_ranks(
+            [math.floor(position), math.ceil(position)]
+        )
+        return lower + (upper - lower) * (position - math.floor(position))
+
+    def median(self):
+        return self.quantile(0.5)
+
+    def p25(self):
+        return self.quantile(0.25)
+
+    def p75(self):
+        return self.quantile(0.75)
@@ -0,0 +1,297 @@
+# ---
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: -all
+#     comment_magics: true
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#       jupytext_version: 1.13.2
+#   kernelspec:
+#     display_name: ojo_local_indicators
+#     language: python
+#     name: ojo_local_indicators
+# ---
+
+# %% [markdown]
+# ### Compact job advert records
+#
+# `JobAd` and `SkillMention` keep only the fields used in the analyses, in
+# `__slots__`, with repeated strings (sectors, locations, skill labels...)
+# interned so every advert points to the same string object. Records can be
+# read like the raw OJO dictionaries (`ad["sector"]`, `ad["features"]`,
+# `skill["preferred_label"]`), so they can be passed to the functions in
+# `clean_data`, `sussex_spotlight` and `analysis/utils`.
+#
+# `ad["features"]` is a view of the record: location, salary and
+# is_duplicate can be changed through it (e.g. by
+# `locations.apply_location_fixes`), and the change is kept in the record.
+# Other fields are read only.
+
+# %%
+import sys
+from collections.abc import MutableMapping
+
+# %%
+# Fields repeated across adverts (stored interned)
+JOB_AD_CATEGORICAL = (
+    "company_raw",
+    "sector",
+    "parent_sector",
+    "raw_salary_unit",
+    "raw_salary_currency",
+)
+
+# Other fields kept from the top level of each advert
+JOB_AD_FIELDS = (
+    "id",
+    "created",
+    "job_title_raw",
+    "job_location_raw",
+    "raw_salary",
+    "raw_min_salary",
+    "raw_max_salary",
+)
+
+# Fields kept from the location (stored interned) and salary features
+LOCATION_FIELDS = ("nuts_2_code", "nuts_2_name")
+SALARY_FIELDS = ("min_annualised_salary", "max_annualised_salary")
+
+SKILL_FIELDS = (
+    "preferred_label",
+    "surface_form",
+    "label_cluster_0",
+    "label_cluster_1",
+    "label_cluster_2",
+)
+
+
+# %%
+def _intern(value):
+    """Interns strings so repeated values share one object."""
+    return sys.intern(value) if type(value) is str else value
+
+
+# %%
+class _Record:
+    """Read only dictionary-like access to the fields of a record.
+    Fields that were missing in the raw dictionary are unset slots."""
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __contains__(self, key):
+        return hasattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+
+# %%
+class SkillMention(_Record):
+    """One skill mentioned in a job advert."""
+
+    __slots__ = SKILL_FIELDS
+
+    @classmethod
+    def from_ojo(cls, skill):
+        """Creates a skill mention from a raw OJO skill dictionary."""
+        mention = cls()
+        for field in SKILL_FIELDS:
+            if field in skill:
+                setattr(mention, field, _intern(skill[field]))
+        return mention
+
+    def to_ojo(self):
+        """Returns the skill mention as a dictionary."""
+        return {field: self[field] for field in SKILL_FIELDS if field in self}
+
+
+# %%
+class _FieldsView(MutableMapping):
+    """Dictionary view of some fields of a job ad (its location or salary).
+    Writes go to the job ad."""
+
+    __slots__ = ("_job_ad", "_fields")
+
+    def __init__(self, job_ad, fields):
+        self._job_ad = job_ad
+        self._fields = fields
+
+    def __getitem__(self, key):
+        if key not in self._fields or not hasattr(self._job_ad, key):
+            raise KeyError(key)
+        return getattr(self._job_ad, key)
+
+    def __setitem__(self, key, value):
+        if key not in self._fields:
+            raise KeyError(f"Job ads don't keep {key}")
+        setattr(self._job_ad, key, _intern(value))
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        delattr(self._job_ad, key)
+
+    def __iter__(self):
+        return (field for field in self._fields if hasattr(self._job_ad, field))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+# %%
+class _FeaturesView(MutableMapping):
+    """Features dictionary of a job ad, in the same shape as the raw OJO
+    advert. Location, salary and is_duplicate can be set (writes go to the
+    job ad); skills are read only."""
+
+    __slots__ = ("_job_ad",)
+
+    def __init__(self, job_ad):
+        self._job_ad = job_ad
+
+    def __getitem__(self, key):
+        job_ad = self._job_ad
+        if key == "is_duplicate" and hasattr(job_ad, "is_duplicate"):
+            return job_ad.is_duplicate
+        if key == "location" and job_ad._has_location:
+            return _FieldsView(job_ad, LOCATION_FIELDS)
+        if key == "salary" and any(hasattr(job_ad, f) for f in SALARY_FIELDS):
+            return _FieldsView(job_ad, SALARY_FIELDS)
+        if key == "skills" and hasattr(job_ad, "skills"):
+            return {"skills": job_ad.skills}
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        job_ad = self._job_ad
+        if key == "is_duplicate":
+            job_ad.is_duplicate = value
+        elif key in ("location", "salary"):
+            fields = LOCATION_FIELDS if key == "location" else SALARY_FIELDS
+            for field in fields:
+                if hasattr(job_ad, field):
+                    delattr(job_ad, field)
+            view = _FieldsView(job_ad, fields)
+            view.update(value or {})
+            if key == "location":
+                job_ad._has_location = value is not None
+        else:
+            raise KeyError(f"features.{key} of job ads is read only")
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        if key == "skills":
+            raise KeyError("features.skills of job ads is read only")
+        if key == "is_duplicate":
+            del self._job_ad.is_duplicate
+        else:
+            self[key] = None
+
+    def __iter__(self):
+        keys = ("is_duplicate", "location", "salary", "skills")
+        return (key for key in keys if key in self)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+    def to_dict(self):
+        """Returns the features as plain dictionaries."""
+        return {
+            key: dict(value) if isinstance(value, _FieldsView) else value
+            for key, value in self.items()
+        }
+
+
+# %%
+class JobAd(_Record):
+    """One job advert. ad["features"] is a view of the record's features
+    (location, salary, skills and is_duplicate), see _FeaturesView."""
+
+    __slots__ = (
+        JOB_AD_FIELDS
+        + JOB_AD_CATEGORICAL
+        + LOCATION_FIELDS
+        + SALARY_FIELDS
+        + ("is_duplicate", "skills", "_has_location")
+    )
+
+    @classmethod
+    def from_ojo(cls, advert):
+        """Creates a job ad from a raw OJO advert dictionary."""
+        job_ad = cls()
+        for field in JOB_AD_FIELDS:
+            if field in advert:
+                setattr(job_ad, field, advert[field])
+        for field in JOB_AD_CATEGORICAL:
+            if field in advert:
+                setattr(job_ad, field, _intern(advert[field]))
+        features = advert.get("features") or {}
+        if "is_duplicate" in features:
+            job_ad.is_duplicate = features["is_duplicate"]
+        location = features.get("location")
+        job_ad._has_location = location is not None
+        for field in LOCATION_FIELDS:
+            if field in (location or {}):
+                setattr(job_ad, field, _intern(location[field]))
+        for field in SALARY_FIELDS:
+            if field in (features.get("salary") or {}):
+                setattr(job_ad, field, features["salary"][field])
+        if "skills" in features:
+            skills = (features["skills"] or {}).get("skills")
+            job_ad.skills = (
+                None
+                if skills is None
+                else tuple(SkillMention.from_ojo(skill) for skill in skills)
+            )
+        return job_ad
+
+    def __getitem__(self, key):
+        if key == "features":
+            return _FeaturesView(self)
+        if key in LOCATION_FIELDS or key in SALARY_FIELDS or key.startswith("_"):
+            raise KeyError(key)
+        return super().__getitem__(key)
+
+    def __contains__(self, key):
+        if key == "features":
+            return True
+        if key in LOCATION_FIELDS or key in SALARY_FIELDS or key.startswith("_"):
+            return False
+        return super().__contains__(key)
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def to_ojo(self):
+        """Returns the job ad as a (reduced) raw OJO advert dictionary."""
+        advert = {
+            field: self.get(field)
+            for field in JOB_AD_FIELDS + JOB_AD_CATEGORICAL
+            if field in self
+        }
+        features = _FeaturesView(self).to_dict()
+        if features.get("skills", {}).get("skills") is not None:
+            features["skills"] = {"skills": [skill.to_ojo() for skill in self.skills]}
+        advert["features"] = features
+        return advert
+
+
+# %%
+def to_job_ads(data):
+    """Converts a list (or iterator) of raw OJO advert dictionaries
+    to compact job ads."""
+    return [JobAd.from_ojo(d) for d in data]
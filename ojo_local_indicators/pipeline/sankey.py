@@ -0,0 +1,122 @@
+# ---
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: -all
+#     comment_magics: true
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#       jupytext_version: 1.13.2
+#   kernelspec:
+#     display_name: ojo_local_indicators
+#     language: python
+#     name: ojo_local_indicators
+# ---
+
+# %% [markdown]
+# ### Sankey data: skills needed for the most common job titles
+#
+# `count_titles_skills` cleans each distinct job title once and, in the
+# same pass, counts the titles mentioned with each broad skill group
+# (`label_cluster_0`) and the broad skill groups mentioned with each title.
+# Memory grows with the number of distinct titles, not adverts, so it can
+# run on the whole UK.
+
+# %%
+import heapq
+from operator import itemgetter
+
+from ojo_local_indicators.analysis.utils import TitleNormaliser
+
+# %%
+# Group holding the titles of all broad skill groups
+ALL_GROUPS = "All"
+
+
+# %%
+def count_titles_skills(job_ads, broad_skills, excluded_terms):
+    """Counts, over non duplicate adverts with skills, the skill mentions of
+    each cleaned job title per broad skill group listed (and in ALL_GROUPS),
+    and the mentions of each broad skill group per title (skills in the
+    taxonomy, i.e. with a label_cluster_2, only). Returns both dictionaries."""
+    title_counts = {group: {} for group in list(broad_skills) + [ALL_GROUPS]}
+    title_skills = {}
+    normalise = TitleNormaliser(excluded_terms)
+
+    # Loop over adverts
+    for one_advert in job_ads:
+
+        # If it's not a duplicate and contains skills
+        features = one_advert["features"]
+        if features.get("is_duplicate") != False or "skills" not in features:
+            continue
+
+        # Clean job title (once per distinct title)
+        job_title = normalise(one_advert["job_title_raw"])
+        skills = title_skills.setdefault(job_title, {})
+
+        for one_skill in features["skills"]["skills"] or []:
+            broad_skill_group = one_skill["label_cluster_0"]
+            if broad_skill_group is not None:
+                for group in (broad_skill_group, ALL_GROUPS):
+                    counts = title_counts.get(group)
+                    if counts is not None:
+                        counts[job_title] = counts.get(job_title, 0) + 1
+            if one_skill["label_cluster_2"] is not None:
+                skills[broad_skill_group] = skills.get(broad_skill_group, 0) + 1
+    return title_counts, title_skills
+
+
+# %%
+def top_titles(title_counts, no_job_titles):
+    """Most mentioned job titles in each group (ties in the order the titles
+    were first seen, as with a stable sort)."""
+    return {
+        group: [
+            title
+            for title, _ in heapq.nlargest(
+                no_job_titles, counts.items(), key=itemgetter(1)
+            )
+        ]
+        for group, counts in title_counts.items()
+    }
+
+
+# %%
+def skill_percents(skills):
+    """Share (%, 2dp) of each broad skill group in the skills of a title."""
+    total_skill_count = sum(skills.values())
+    return {
+        group: round(100 * count / total_skill_count, 2)
+        for group, count in skills.items()
+    }
+
+
+# %%
+def sankey_data(top, title_skills, broad_skills):
+    """Nodes (top titles of each group, then broad skill groups) and links
+    (share of each broad skill group in the skills of each top title)."""
+    percents = {}
+    nodes_job_titles = []
+    links = []
+    for group, titles in top.items():
+        for job_title in titles:
+            if job_title not in percents:
+                percents[job_title] = skill_percents(title_skills[job_title])
+            # Names need to be unique so the group is added to them
+            name = job_title.title() + " " + group
+            nodes_job_titles.append(
+                {"name": name, "actual_name": job_title.title(), "category": group}
+            )
+            links.extend(
+                {
+                    "source": name,
+                    "target": broad_skill_group,
+                    "value": percent,
+                    "category": group,
+                }
+                for broad_skill_group, percent in percents[job_title].items()
+            )
+    nodes_skills = [{"name": value, "category": "Skill"} for value in broad_skills]
+    return {"nodes": nodes_job_titles[::-1] + nodes_skills, "links": links}
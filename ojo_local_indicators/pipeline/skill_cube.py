@@ -0,0 +1,182 @@
+# ---
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: -all
+#     comment_magics: true
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#       jupytext_version: 1.13.2
+#   kernelspec:
+#     display_name: ojo_local_indicators
+#     language: python
+#     name: ojo_local_indicators
+# ---
+
+# %% [markdown]
+# ### Skill taxonomy cube
+#
+# Number of adverts mentioning each skill label at every level of the
+# taxonomy (`label_cluster_0`, `label_cluster_1`, `label_cluster_2`,
+# `preferred_label`), by day, NUTS 2 region and sector. Level "all" counts
+# all adverts (with or without skills), to use as denominators.
+#
+# An advert is only counted once per label, so counts add up over dates,
+# regions and sectors (each advert has one of each) but not over labels:
+# an advert mentioning two `label_cluster_2` groups of the same
+# `label_cluster_0` counts once for it. That is why every level is counted
+# separately rather than summed from the finer ones.
+#
+# The cube is stored next to the flattened tables of a data dump (see
+# `flatten_data`) with categorical columns, so it is built once per dump.
+
+# %%
+import os
+
+import pandas as pd
+
+from ojo_local_indicators.pipeline.flatten_data import (
+    TABLE_SCHEMAS,
+    flatten_advert,
+    get_tables_dir,
+    read_table,
+)
+
+# %%
+# Taxonomy levels, broadest first
+CUBE_LEVELS = [
+    "label_cluster_0",
+    "label_cluster_1",
+    "label_cluster_2",
+    "preferred_label",
+]
+
+# Level and label counting all adverts
+ALL_ADVERTS = "all"
+
+# Dimensions of the cube (besides level and label)
+CUBE_DIMENSIONS = ["date", "nuts_2_code", "sector"]
+
+
+# %%
+def build_skill_cube(adverts, skills, dimensions=CUBE_DIMENSIONS, levels=CUBE_LEVELS):
+    """Builds the cube from the flattened adverts (id, created, nuts_2_code,
+    sector) and skills (advert_id and levels) tables. Other dimensions
+    (columns of adverts) and levels can be given, e.g. a cube of the
+    label_cluster_0 groups by job title."""
+    dimensions = list(dimensions)
+    if "date" in dimensions and "date" not in adverts:
+        adverts = adverts.assign(
+            date=pd.to_datetime(adverts["created"].str[:10], format="%Y-%m-%d")
+        )
+    # One row per advert (the last copy of a repeated id), so an advert
+    # isn't counted again for each copy when its skills are joined
+    adverts = adverts.drop_duplicates("id", keep="last")
+    adverts = adverts[["id"] + dimensions].set_index("id")
+    parts = [
+        adverts.groupby(dimensions, dropna=False, observed=True)
+        .size()
+        .reset_index(name="adverts")
+        .assign(level=ALL_ADVERTS, label=ALL_ADVERTS)
+    ]
+    for level in levels:
+        # Each label once per advert
+        presence = skills[["advert_id", level]].dropna().drop_duplicates()
+        presence = presence.join(adverts, on="advert_id", how="inner")
+        parts.append(
+            presence.groupby([level] + dimensions, dropna=False, observed=True)
+            .size()
+            .reset_index(name="adverts")
+            .rename(columns={level: "label"})
+            .assign(level=level)
+        )
+    cube = pd.concat(parts, ignore_index=True)
+    cube = cube[["level", "label"] + dimensions + ["adverts"]]
+    for column in ["level", "label"] + dimensions:
+        if column != "date":
+            cube[column] = cube[column].astype("category")
+    cube["adverts"] = cube["adverts"].astype("int32")
+    return cube
+
+
+# %%
+def build_skill_cube_from_adverts(
+    job_ads, dimensions=CUBE_DIMENSIONS, levels=CUBE_LEVELS
+):
+    """Builds the cube from a list (or iterator) of OJO advert dictionaries."""
+    advert_rows = []
+    skill_rows = []
+    for job_ad in job_ads:
+        advert_row, skills, _ = flatten_advert(job_ad)
+        advert_rows.append(advert_row)
+        skill_rows.extend(skills)
+    skills = pd.DataFrame(skill_rows, columns=["advert_id"] + CUBE_LEVELS)
+    adverts = pd.DataFrame(advert_rows, columns=TABLE_SCHEMAS["adverts"].names)
+    return build_skill_cube(adverts, skills, dimensions, levels)
+
+
+# %%
+def get_skill_cube(file):
+    """Reads the cube for a data dump, building it (from the flattened
+    tables) the first time."""
+    path = f"{get_tables_dir(file)}/skill_cube.parquet"
+    if not os.path.exists(path):
+        cube = build_skill_cube(
+            read_table(file, "adverts", ["id", "created", "nuts_2_code", "sector"]),
+            read_table(file, "skills", ["advert_id"] + CUBE_LEVELS),
+        )
+        cube.to_parquet(path + ".tmp", index=False)
+        os.replace(path + ".tmp", path)
+    return pd.read_parquet(path)
+
+
+# %%
+def _as_list(values):
+    """Filter values (one value or a list) as a list."""
+    return [values] if isinstance(values, str) else list(values)
+
+
+# %%
+def slice_cube(cube, level, start=None, end=None, **filters):
+    """Rows of the cube for one level, between start and end dates (included,
+    "yyyy-mm-dd") and where each dimension given (label, nuts_2_code, sector)
+    has one of the values given, e.g. slice_cube(cube, "label_cluster_2",
+    label=engineering, nuts_2_code="UKJ2")."""
+    mask = cube["level"] == level
+    if start is not None:
+        mask &= cube["date"] >= pd.Timestamp(start)
+    if end is not None:
+        mask &= cube["date"] <= pd.Timestamp(end)
+    for column, values in filters.items():
+        mask &= cube[column].isin(_as_list(values))
+    return cube[mask]
+
+
+# %%
+def rollup(cube, level, by=("label",), start=None, end=None, **filters):
+    """Number of adverts mentioning each label of a level, summed over
+    all dimensions not in by (e.g. by=("label", "nuts_2_code")), for the
+    slice given (see slice_cube). Returns a series sorted by count."""
+    counts = (
+        slice_cube(cube, level, start, end, **filters)
+        .groupby(list(by), observed=True)["adverts"]
+        .sum()
+    )
+    return counts[counts > 0].sort_values(ascending=False)
+
+
+# %%
+def taxonomy(skills):
+    """Distinct combinations of the levels in a skills table (or list of
+    skill dictionaries), broadest level first, e.g. to find the
+    label_cluster_2 groups within a label_cluster_0 group."""
+    skills = pd.DataFrame(skills, columns=CUBE_LEVELS)
+    return skills.drop_duplicates().reset_index(drop=True)
+
+
+# %%
+def labels_within(taxonomy_df, level, parent_level, parents):
+    """Labels of a level within one or several labels of a broader level."""
+    within = taxonomy_df[taxonomy_df[parent_level].isin(_as_list(parents))]
+    return list(within[level].dropna().unique())
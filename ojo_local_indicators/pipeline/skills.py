@@ -0,0 +1,281 @@
+# ---
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: -all
+#     comment_magics: true
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#       jupytext_version: 1.13.2
+#   kernelspec:
+#     display_name: ojo_local_indicators
+#     language: python
+#     name: ojo_local_indicators
+# ---
+
+# %% [markdown]
+# ### Skill counts and salaries for every skill cluster, in one pass
+#
+# `aggregate_skills` walks the adverts once and, for every cluster at each
+# taxonomy level (e.g. "Information & Communication Technologies" at
+# `label_cluster_0`, "Civil Engineering" at `label_cluster_2`), counts each
+# `preferred_label` and sketches the annualised salaries of the adverts
+# mentioning it (`SalarySketch`, so memory does not grow with the number of
+# adverts). The digital, transversal, engineering and health analyses are
+# then queries on the result (`cluster_skills`). Aggregates of different
+# batches of adverts (e.g. from parallel workers) can be combined with
+# `merge_aggregates`.
+
+# %%
+import numpy as np
+from scipy import sparse
+
+from ojo_local_indicators.analysis.utils import annualises_salary
+from ojo_local_indicators.pipeline.quantiles import SalarySketch
+from ojo_local_indicators.pipeline.records import SKILL_FIELDS
+
+# %%
+# Taxonomy levels aggregated by default
+LEVELS = ("label_cluster_0", "label_cluster_2")
+
+
+# %%
+def _new_skill(label):
+    """Entry for a skill in the aggregates."""
+    return {
+        "skill_count": 0,
+        "label": label,
+        "min_salaries": SalarySketch(),
+        "max_salaries": SalarySketch(),
+    }
+
+
+# %%
+def _merge_skills(skills, other):
+    """Adds the counts and salaries of the skills in other to skills
+    (both {preferred_label: skill entry}), in place."""
+    for label, value in other.items():
+        if label not in skills:
+            skills[label] = _new_skill(label)
+        skills[label]["skill_count"] += value["skill_count"]
+        skills[label]["min_salaries"].merge(value["min_salaries"])
+        skills[label]["max_salaries"].merge(value["max_salaries"])
+    return skills
+
+
+# %%
+def _split_exclude(exclude):
+    """Splits exclusions ({field: values}) into those on advert fields
+    and those on skill fields."""
+    exclude = {field: set(values) for field, values in (exclude or {}).items()}
+    return (
+        {f: v for f, v in exclude.items() if f not in SKILL_FIELDS},
+        {f: v for f, v in exclude.items() if f in SKILL_FIELDS},
+    )
+
+
+# %%
+def _excluded(record, exclude):
+    """Whether an advert or skill has an excluded value in any field."""
+    return any(record.get(field) in values for field, values in exclude.items())
+
+
+# %%
+def aggregate_skills(job_ads, levels=LEVELS, exclude=None):
+    """Counts each skill (preferred_label) and sketches the annualised salaries
+    of the adverts mentioning it, for every cluster at each level.
+    exclude maps advert fields (e.g. company_raw: drops the advert) or skill
+    fields (e.g. surface_form: drops the skill mention) to values to leave out, e.g.
+    {"company_raw": EXCLUDED_RECRUITERS, "surface_form": EXCLUDED_SURFACE_FORMS}.
+    Returns {level: {cluster: {preferred_label: skill entry}}}."""
+    advert_exclude, skill_exclude = _split_exclude(exclude)
+    aggregates = {level: {} for level in levels}
+
+    # Loop over job ads
+    for one_job in job_ads:
+
+        # Only job adverts with skills and not excluded
+        features = one_job.get("features", {})
+        if "skills" not in features or _excluded(one_job, advert_exclude):
+            continue
+
+        # Salaries are annualised once per advert
+        salaries = annualises_salary(one_job)
+
+        for one_skill in features["skills"]["skills"] or []:
+            if _excluded(one_skill, skill_exclude):
+                continue
+            label = one_skill["preferred_label"]
+            for level in levels:
+                clusters = aggregates[level].setdefault(one_skill[level], {})
+                if label not in clusters:
+                    clusters[label] = _new_skill(label)
+                clusters[label]["skill_count"] += 1
+                if salaries[0] is not None:
+                    clusters[label]["min_salaries"].add(salaries[0])
+                    clusters[label]["max_salaries"].add(salaries[1])
+    return aggregates
+
+
+# %%
+def cluster_skills(aggregates, level, clusters):
+    """Skills of one or several clusters at a level (e.g. the engineering
+    clusters at label_cluster_2), as {preferred_label: skill entry}."""
+    if isinstance(clusters, str):
+        clusters = [clusters]
+    skills = {}
+    for cluster in clusters:
+        _merge_skills(skills, aggregates[level].get(cluster, {}))
+    return skills
+
+
+# %%
+def merge_aggregates(aggregates_list):
+    """Combines the aggregates (see aggregate_skills) of several batches of
+    adverts, e.g. computed in parallel."""
+    merged = {}
+    for aggregates in aggregates_list:
+        for level, level_clusters in aggregates.items():
+            for cluster, skills in level_clusters.items():
+                _merge_skills(
+                    merged.setdefault(level, {}).setdefault(cluster, {}), skills
+                )
+    return merged
+
+
+# %% [markdown]
+# ### Occupations by skills
+#
+# `occupation_skill_matrix` counts the mentions of each skill of some clusters
+# in the adverts of each occupation (`sector`), as a sparse matrix with
+# occupations and skills encoded as integers. The percentages and rankings
+# used in the bubble charts and "one skill and occupations" charts are
+# computed from it.
+
+# %%
+def occupation_skill_matrix(job_ads, level, clusters, skills=None, exclude=None):
+    """Counts mentions of the skills in clusters (at level) per occupation.
+    skills sets the order of the skill columns (e.g. most common first),
+    other skills found are added after them. exclude is as in aggregate_skills.
+    Returns a dictionary with the occupation and skill names, the counts
+    (CSR matrix, occupations x skills), the number of adverts with skills
+    per occupation (job_count) and of adverts mentioning at least one
+    skill of the clusters (job_count_skills)."""
+    if isinstance(clusters, str):
+        clusters = [clusters]
+    clusters = set(clusters)
+    advert_exclude, skill_exclude = _split_exclude(exclude)
+    occupation_index = {}
+    skill_index = {skill: index for index, skill in enumerate(skills or [])}
+    job_count = []
+    job_count_skills = []
+    rows = []
+    columns = []
+
+    # Loop over job ads
+    for one_job in job_ads:
+
+        # Occupations are listed in the order they are first seen
+        row = occupation_index.setdefault(one_job.get("sector"), len(occupation_index))
+        if row == len(job_count):
+            job_count.append(0)
+            job_count_skills.append(0)
+
+        # Only job adverts with skills and not excluded
+        features = one_job.get("features", {})
+        if "skills" not in features or _excluded(one_job, advert_exclude):
+            continue
+        job_count[row] += 1
+
+        requires_one_skill = False
+        for one_skill in features["skills"]["skills"] or []:
+            if one_skill[level] in clusters and not _excluded(one_skill, skill_exclude):
+                requires_one_skill = True
+                label = one_skill["preferred_label"]
+                rows.append(row)
+                columns.append(skill_index.setdefault(label, len(skill_index)))
+        if requires_one_skill:
+            job_count_skills[row] += 1
+
+    counts = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=int), (rows, columns)),
+        shape=(len(occupation_index), len(skill_index)),
+    )
+    return {
+        "occupations": list(occupation_index),
+        "skills": list(skill_index),
+        "counts": counts,
+        "job_count": np.array(job_count),
+        "job_count_skills": np.array(job_count_skills),
+    }
+
+
+# %%
+def _percent(counts, job_count):
+    """100 * counts / job_count, 0 where there are no adverts."""
+    return np.divide(
+        100 * counts, job_count, out=np.zeros(counts.shape), where=job_count > 0
+    )
+
+
+# %%
+def _indices(names, selected):
+    """Positions of the selected names (all if None) in names."""
+    if selected is None:
+        return np.arange(len(names))
+    index = {name: position for position, name in enumerate(names)}
+    return np.array([index[name] for name in selected], dtype=int)
+
+
+# %%
+def skill_percents(matrix, occupations=None, skills=None):
+    """Percentage of the adverts of each occupation mentioning each skill
+    (as a dense array, occupations x skills), for the occupations and skills
+    given (default all)."""
+    rows = _indices(matrix["occupations"], occupations)
+    columns = _indices(matrix["skills"], skills)
+    counts = matrix["counts"][rows][:, columns].toarray()
+    return _percent(counts, matrix["job_count"][rows][:, None])
+
+
+# %%
+def rank_occupations(matrix, by="percent_with_skills", minimum_job_count=0, n=None):
+    """Names of occupations with at least minimum_job_count adverts, sorted
+    by the percentage of adverts mentioning a skill of the clusters
+    (percent_with_skills) or by job_count, largest first. Top n only if given."""
+    if by == "percent_with_skills":
+        key = _percent(matrix["job_count_skills"], matrix["job_count"])
+    else:
+        key = matrix[by]
+    # Stable so ties stay in the order occupations were first seen
+    order = np.argsort(-key, kind="stable")
+    order = order[matrix["job_count"][order] >= minimum_job_count]
+    return [matrix["occupations"][index] for index in order[:n]]
+
+
+# %%
+def occupations_with_skill(
+    matrix,
+    skill,
+    minimum_percent=0,
+    minimum_job_count=0,
+    by="percent_with_skills",
+):
+    """Occupations where at least minimum_percent of adverts mention skill and
+    with at least minimum_job_count adverts, in the order of rank_occupations.
+    Returns a list of dictionaries with label, job_count and skill_percent."""
+    column = matrix["skills"].index(skill)
+    percents = _percent(
+        matrix["counts"][:, column].toarray().ravel(), matrix["job_count"]
+    )
+    rows = {name: index for index, name in enumerate(matrix["occupations"])}
+    return [
+        {
+            "label": occupation,
+            "job_count": matrix["job_count"][rows[occupation]],
+            "skill_percent": percents[rows[occupation]],
+        }
+        for occupation in rank_occupations(matrix, by, minimum_job_count)
+        if percents[rows[occupation]] >= minimum_percent
+    ]
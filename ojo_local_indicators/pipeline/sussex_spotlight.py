@@ -16,7 +16,10 @@
 
 # %%
 from collections import Counter
+from collections.abc import Mapping
+import numpy as np
 import pandas as pd
+import ojo_local_indicators.pipeline.locations as loc
 
 
 # %% [markdown]
@@ -48,6 +51,18 @@ def skill_count(skills, label):
     return count_list
 
 
+# %%
+def presence_counts(skills, label):
+    """Counts the job adverts mentioning each skill (at label) at least once,
+    in one pass (same totals as summing the result of combine)."""
+    counts = Counter()
+    for skill in skills:
+        if skill is not None:
+            # Each skill once per advert, in the order first mentioned
+            counts.update(dict.fromkeys((s[label] for s in skill), 1))
+    return counts
+
+
 # %%
 def combine(dictionaries):
     """Combines the result of skill_count to give the list of 1s per skill group"""
@@ -58,6 +73,20 @@ def combine(dictionaries):
     return combined_dict
 
 
+# %%
+def skills_table_df(skills, n_adverts, label):
+    """Creates a dataframe of the percentage of ads requiring each skill type
+    from a flattened skills table (see flatten_data) and the number of adverts."""
+    presence = skills[["advert_id", label]].dropna().drop_duplicates()
+    counts = presence[label].value_counts(sort=False)
+    return pd.DataFrame(
+        {
+            "Skill": counts.index,
+            "Adverts requiring skill group": counts.values / n_adverts,
+        }
+    )
+
+
 # %%
 def get_salary_fields(data, field):
     """Gets the salary field from OJO list of dictionaries."""
@@ -70,13 +99,18 @@ def get_salary_fields(data, field):
 # %%
 def locations_skills_df(area, cluster):
     """Creates a dataframe of the percentage of ads requiring each skill type from a
-    selected area and skill group"""
-    clusters = combine(cluster)
-    skills = []
-    for skill in list(clusters.keys()):
-        skills.append(sum(clusters[skill]) / len(area))
+    selected area and skill group, given as presence counts (see presence_counts)
+    or as the per advert counts of skill_count"""
+    if isinstance(cluster, Mapping):
+        counts = cluster
+    else:
+        # Per advert counts (skill_count), summed per skill group
+        counts = Counter()
+        for advert_counts in cluster:
+            counts.update(advert_counts)
+    shares = np.fromiter(counts.values(), dtype=float, count=len(counts)) / len(area)
     df_area = pd.DataFrame(
-        {"Skill": list(clusters.keys()), "Adverts requiring skill group": skills}
+        {"Skill": list(counts.keys()), "Adverts requiring skill group": shares}
     )
     df_area = df_area[df_area["Skill"].notna()]
     return df_area
@@ -116,10 +150,9 @@ def skills_salary_df(skills_sussex, top_skills):
 def remove_sussex_uk(sussex, uk_sample):
     """Removing vacancies in the Sussex dictionary for 'rest of UK sample'"""
     # Sussex ids
-    j_id = [d["id"] for d in sussex if "id" in d]
+    j_id = loc.area_ids(sussex)
     # Removing Sussex from UK sample
-    uk_sample = [d for d in uk_sample if d["id"] not in j_id]
-    return uk_sample
+    return loc.partition_areas(uk_sample, {"Sussex": j_id})[loc.REST_OF_UK]
 
 
 # %%
@@ -15,74 +15,85 @@
 # ---
 
 # %%
+import altair as alt
 import pandas as pd
 import ojo_local_indicators
 import ojo_local_indicators.pipeline.clean_data as cd
-from ojd_daps.dqa.data_getters import get_cached_job_ads
+import ojo_local_indicators.pipeline.locations as loc
+from ojo_local_indicators.pipeline.geometry import TOPOJSON_OBJECT
+from ojo_local_indicators import logger
+from ojo_local_indicators.getters.job_ads import iter_job_ads
 
 # %%
 # Set directory
 project_directory = ojo_local_indicators.PROJECT_DIR
 
+# Cached job ads windows for June-Nov 2021
+UK_WINDOWS = [
+    ("07-06-2021", "19-07-2021"),
+    ("19-07-2021", "30-08-2021"),
+    ("30-08-2021", "11-10-2021"),
+    ("11-10-2021", "22-11-2021"),
+]
+
+# Periods compared in the growth analyses (name, first day, last day)
+GROWTH_WINDOWS = [
+    ("June to August", "2021-06-01", "2021-08-31"),
+    ("September to November", "2021-09-01", None),
+]
+
 
 # %%
 def get_uk_ads():
     """Get UK ads for June-Nov 2021 OJO list of dictionaries."""
-    # Get cached jobs for period
-    job_ads1 = get_cached_job_ads("07-06-2021", "19-07-2021")
-    job_ads2 = get_cached_job_ads("19-07-2021", "30-08-2021")
-    job_ads3 = get_cached_job_ads("30-08-2021", "11-10-2021")
-    job_ads4 = get_cached_job_ads("11-10-2021", "22-11-2021")
-    job_ads = job_ads1 + job_ads2 + job_ads3 + job_ads4  # Combine
-    # Remove duplicates
-    filtered_dict = {(d["id"]): d for d in job_ads}
-    job_ads_de_dup = [value for value in filtered_dict.values()]
-    # Apply fixes
-    fixes = pd.read_excel(f"{project_directory}/inputs/data/nuts_2_fixes.xlsx")
-    fixes = fixes[["job_location_raw", "Code"]].copy()
-    # Locations list (correct names)
-    locations_n = cd.get_location_fields(job_ads, "nuts_2_name")
-    locations_c = cd.get_location_fields(job_ads, "nuts_2_code")
-    locations_n = list(dict.fromkeys(locations_n))
-    locations_c = list(dict.fromkeys(locations_c))
-    locations_n = [i for i in locations_n if i]
-    locations_c = [i for i in locations_c if i]
-    locations = pd.DataFrame(
-        list(zip(locations_n, locations_c)), columns=["Name", "Code"]
+    # Get cached jobs for period, removing duplicates (last copy kept)
+    counts = {}
+    job_ads_de_dup = list(
+        cd.dedup_adverts(lambda: iter_job_ads(UK_WINDOWS), keep="last", counts=counts)
+    )
+    logger.info(f"Removed {counts['repeated_id']} repeated adverts")
+    # Apply fixes (one lookup per advert)
+    fix_lookup = loc.read_fix_lookup(
+        f"{project_directory}/inputs/data/nuts_2_fixes.xlsx", job_ads_de_dup
+    )
+    touched = loc.apply_location_fixes(job_ads_de_dup, fix_lookup)
+    logger.info(
+        f"NUTS 2 fixes updated {sum(touched.values())} adverts "
+        f"({len(touched)} of {len(fix_lookup)} fixes used)"
     )
-    fixes = fixes.merge(locations, on="Code", how="left")
-    # Takes about 5 mins...
-    for index, row in fixes.iterrows():
-        for my_dict in job_ads_de_dup:
-            if all(k in my_dict for k in ("job_location_raw", "features")):
-                if my_dict["job_location_raw"] == row["job_location_raw"]:
-                    if "location" in my_dict["features"]:
-                        my_dict["features"]["location"]["nuts_2_code"] = row["Code"]
-                        my_dict["features"]["location"]["nuts_2_name"] = row["Name"]
     return job_ads_de_dup  # Return job ads
 
 
 # %%
-def sussex_fix():
+def sussex_fix(job_ads_de_dup):
     """Temporary split of Sussex and surrey from Nuts 2"""
 
     sussex = cd.open_data_dump(
         f"{project_directory}/outputs/data/sussex_07-06-2021_22-11-2021_surrey_rem.json"
     )
-    for my_dict in sussex:
-        my_dict["features"]["location"]["nuts_2_code"] = "Sussex"
-        my_dict["features"]["location"]["nuts_2_name"] = "Sussex"
-    j_id = [d["id"] for d in sussex if "id" in d]
-    job_ads_de_dup = [d for d in job_ads_de_dup if d["id"] not in j_id]
-    job_ads_de_dup = job_ads_de_dup + sussex
-    return job_ads_de_dup  # Return job ads
+    loc.relabel_nuts(sussex, "Sussex", "Sussex")
+    # Replace the UK adverts that are in Sussex with the relabelled ones
+    areas = loc.partition_areas(job_ads_de_dup, {"Sussex": loc.area_ids(sussex)})
+    return areas[loc.REST_OF_UK] + sussex  # Return job ads
 
 
 # %%
 def create_nuts_map_divergent(
-    df, col_val, col_la, col_range, min_scale, max_scale, sort, mid_scale
+    df,
+    col_val,
+    col_la,
+    col_range,
+    min_scale,
+    max_scale,
+    sort,
+    mid_scale,
+    topojson_url=None,
+    key="Nuts 2",
 ):
-    """Diverging colours nuts map of the uk"""
+    """Diverging colours nuts map of the uk. With topojson_url, the regions
+    are loaded from that (shared) TopoJSON file, see
+    geometry.export_nuts_topojson, and only the key, col_val and col_la
+    columns of df are embedded, to be joined to the regions in the browser."""
     # Creating configs for color,selection,hovering
     geo_select = alt.selection_single(fields=["reach_area"])
     color = alt.condition(
@@ -96,10 +107,18 @@ def create_nuts_map_divergent(
         ),
         alt.value("lightgray"),
     )
+    if topojson_url is None:
+        chart = alt.Chart(df)
+    else:
+        values = pd.DataFrame(df[[key, col_val, col_la]])
+        chart = alt.Chart(alt.topo_feature(topojson_url, TOPOJSON_OBJECT))
+        chart = chart.transform_lookup(
+            lookup=f"properties.{key}",
+            from_=alt.LookupData(values, key, [col_val, col_la]),
+        )
     # Creating an altair map layer
     choro = (
-        alt.Chart(df)
-        .mark_geoshape(stroke="black")
+        chart.mark_geoshape(stroke="black")
         .encode(
             color=color,
             tooltip=[
@@ -119,12 +138,17 @@ def create_nuts_map_divergent(
 
 # %%
 def sector_df(uk_sample, sector, sec_name):
-    """industry or occupations df from job ads"""
-    sector_uk = [d[sector] for d in uk_sample if sector in d]
-    created_uk = [d["created"] for d in uk_sample if "created" in d]
-    sec_uk = pd.DataFrame(
-        list(zip(sector_uk, created_uk)), columns=[sec_name, "created"]
-    )
+    """industry or occupations df from job ads (list of dicts or
+    flattened adverts df, see cd.read_adverts)"""
+    if isinstance(uk_sample, pd.DataFrame):
+        sec_uk = uk_sample[[sector, "created"]].dropna()
+        sec_uk.columns = [sec_name, "created"]
+    else:
+        sector_uk = [d[sector] for d in uk_sample if sector in d]
+        created_uk = [d["created"] for d in uk_sample if "created" in d]
+        sec_uk = pd.DataFrame(
+            list(zip(sector_uk, created_uk)), columns=[sec_name, "created"]
+        )
     sec_uk["created"] = pd.to_datetime(sec_uk["created"], format="%Y-%m-%d")
     sec_uk[sec_name] = sec_uk[sec_name].str.replace("&amp; ", "")
     sec_uk.set_index("created", inplace=True)
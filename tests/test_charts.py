@@ -0,0 +1,140 @@
+import os
+
+from matplotlib.figure import Figure
+
+from ojo_local_indicators.pipeline import charts as ch
+
+COLORS = ["#69E0C5", "#97D9E3", "#FDB633", "#981BBE"]
+
+
+def salary_job(path, n_skills=3, **options):
+    skills = [
+        {
+            "label": f"skill {i}",
+            "median_min_salaries": 20000 + 1000 * i,
+            "median_max_salaries": 30000 + 1000 * i,
+        }
+        for i in range(n_skills)
+    ]
+    return ch.chart_job(
+        "salary_ranges",
+        ch.salary_ranges_data(skills),
+        str(path),
+        colors=COLORS,
+        figsize=(4, 4),
+        **options,
+    )
+
+
+def one_skill_job(path):
+    return ch.chart_job(
+        "one_skill",
+        ch.one_skill_data([("Nurse", 12.5), ("Cook", 40.0)]),
+        str(path),
+        colors=COLORS,
+        figsize=(4, 4),
+    )
+
+
+def render(jobs, cache_dir, **kwargs):
+    return ch.render_charts(
+        jobs, max_workers=1, dpi=20, cache_dir=str(cache_dir), **kwargs
+    )
+
+
+def test_chart_key():
+    job = salary_job("a.png")
+    assert ch.chart_key(job) == ch.chart_key(salary_job("b.png"))
+    assert ch.chart_key(job) != ch.chart_key(salary_job("a.png", n_skills=4))
+    assert ch.chart_key(job) != ch.chart_key(salary_job("a.png", y_label="Skills"))
+    assert ch.chart_key(job) != ch.chart_key(job, dpi=100)
+
+
+def test_chart_key_hashes_module_code(monkeypatch):
+    key = ch.chart_key(salary_job("a.png"))
+    # e.g. _legend changed
+    monkeypatch.setattr(ch, "_charts_code", lambda: "changed")
+    assert ch.chart_key(salary_job("a.png")) != key
+
+
+def test_render_charts_reuses_cached(tmp_path):
+    cache_dir = tmp_path / ".cache"
+    jobs = [salary_job(tmp_path / "a.png"), one_skill_job(tmp_path / "b.png")]
+    summary = render(jobs, cache_dir)
+    assert list(summary["status"]) == ["rendered", "rendered"]
+    assert (tmp_path / "a.png").exists() and (tmp_path / "b.png").exists()
+    assert len(os.listdir(cache_dir)) == 2
+
+    # Unchanged charts are copied from the cache, even if their copy is gone
+    (tmp_path / "a.png").unlink()
+    jobs[1] = salary_job(tmp_path / "b.png", n_skills=4)
+    summary = render(jobs, cache_dir)
+    assert list(summary["status"]) == ["reused", "rendered"]
+    assert summary.loc[0, "seconds"] == 0.0
+    assert (tmp_path / "a.png").exists()
+
+
+def test_render_charts_evicts_unused(tmp_path):
+    cache_dir = tmp_path / ".cache"
+    render([one_skill_job(tmp_path / "old.png")], cache_dir)
+    (tmp_path / "old.png").unlink()
+    summary = render([salary_job(tmp_path / "a.png")], cache_dir, max_cache_bytes=0)
+    # The chart used by the run is kept, over the limit
+    assert os.listdir(cache_dir) == [summary.loc[0, "key"] + ".png"]
+
+
+def test_clean_figure_cache_least_recently_used(tmp_path):
+    for age, name in enumerate(["new", "old", "oldest"]):
+        path = tmp_path / f"{name}.png"
+        path.write_bytes(b"x" * 10)
+        os.utime(path, (1000 - age, 1000 - age))
+    removed = ch.clean_figure_cache(
+        str(tmp_path), 15, keep=[str(tmp_path / "oldest.png")]
+    )
+    assert removed == 2
+    assert os.listdir(tmp_path) == ["oldest.png"]
+
+
+def test_orphaned_figures_are_listed(tmp_path):
+    cache_dir = tmp_path / ".cache"
+    render(
+        [salary_job(tmp_path / "a.png"), one_skill_job(tmp_path / "b.png")], cache_dir
+    )
+    (tmp_path / "notes.txt").write_text("not a chart")
+    # b.png is another script's chart (still cached), renamed.png a stale one
+    (tmp_path / "renamed.png").write_bytes(b"stale chart")
+    summary = render([salary_job(tmp_path / "a.png")], cache_dir)
+    orphaned = summary[summary["status"] == "orphaned"]
+    assert list(orphaned["path"]) == [str(tmp_path / "renamed.png")]
+    assert os.path.exists(tmp_path / "renamed.png")
+
+
+def test_salary_ticks_have_commas():
+    job = salary_job("a.png")
+    ax = Figure().subplots()
+    ch.draw_salary_ranges(ax, job["data"], job["options"])
+    formatter = ax.xaxis.get_major_formatter()
+    assert formatter(25000.0) == "25,000"
+
+
+def test_orphaned_figures_removed_over_limit(tmp_path):
+    cache_dir = tmp_path / ".cache"
+    for age, name in enumerate(["new", "old", "oldest"]):
+        path = tmp_path / f"{name}.png"
+        path.write_bytes(name.encode() * 10)
+        os.utime(path, (1000 - age, 1000 - age))
+    size = os.path.getsize(tmp_path / "new.png")
+    summary = render(
+        [salary_job(tmp_path / "a.png")], cache_dir, max_orphaned_bytes=size
+    )
+    statuses = dict(zip(summary["path"], summary["status"]))
+    assert statuses[str(tmp_path / "new.png")] == "orphaned"
+    assert statuses[str(tmp_path / "old.png")] == "removed"
+    assert statuses[str(tmp_path / "oldest.png")] == "removed"
+    assert sorted(os.listdir(tmp_path)) == [".cache", "a.png", "new.png"]
+
+    # Off by default, and the charts of the run are never removed
+    summary = render([salary_job(tmp_path / "a.png")], cache_dir)
+    assert list(summary["status"]) == ["reused", "orphaned"]
+    render([salary_job(tmp_path / "a.png")], cache_dir, max_orphaned_bytes=0)
+    assert sorted(os.listdir(tmp_path)) == [".cache", "a.png"]
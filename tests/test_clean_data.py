@@ -0,0 +1,91 @@
+import pytest
+
+from ojo_local_indicators.pipeline.clean_data import dedup_adverts
+
+
+def advert(advert_id, created, copy, is_duplicate=False):
+    return {
+        "id": advert_id,
+        "created": created,
+        "copy": copy,
+        "features": {"is_duplicate": is_duplicate},
+    }
+
+
+ADVERTS = [
+    advert(1, "2021-06-07", "a"),
+    advert(2, "2021-06-08", "a"),
+    advert(1, "2021-06-09", "b"),
+    advert(3, "2021-06-09", "a", is_duplicate=True),
+    # Older copy later in the input
+    advert(2, "2021-06-01", "b"),
+    advert(1, "2021-06-09", "c"),
+]
+
+
+def copies(adverts):
+    return [(d["id"], d["copy"]) for d in adverts]
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_dedup_first(compact):
+    counts = {}
+    kept = dedup_adverts(iter(ADVERTS), keep="first", compact=compact, counts=counts)
+    assert copies(kept) == [(1, "a"), (2, "a"), (3, "a")]
+    assert counts == {"read": 6, "repeated_id": 3, "flagged_duplicate": 0, "kept": 3}
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_dedup_last(compact):
+    counts = {}
+    kept = list(dedup_adverts(ADVERTS, keep="last", compact=compact, counts=counts))
+    # The last copy of each id (as a dictionary by id keeps), where it is
+    assert copies(kept) == [(3, "a"), (2, "b"), (1, "c")]
+    assert sorted(copies(kept)) == sorted(
+        copies({d["id"]: d for d in ADVERTS}.values())
+    )
+    assert counts == {"read": 6, "repeated_id": 3, "flagged_duplicate": 0, "kept": 3}
+
+
+@pytest.mark.parametrize("keep", ["first", "last"])
+def test_dedup_drop_flagged(keep):
+    counts = {}
+    kept = list(dedup_adverts(ADVERTS, keep=keep, drop_flagged=True, counts=counts))
+    assert sorted(d["id"] for d in kept) == [1, 2]
+    assert counts["flagged_duplicate"] == 1
+    assert counts["kept"] == 2
+
+
+@pytest.mark.parametrize("keep, n_reads", [("first", 1), ("last", 2)])
+def test_dedup_reads(keep, n_reads):
+    calls = []
+
+    def read():
+        calls.append(1)
+        return iter(ADVERTS)
+
+    assert len(list(dedup_adverts(read, keep=keep))) == 3
+    assert len(calls) == n_reads
+
+
+def test_dedup_last_needs_to_read_twice():
+    with pytest.raises(ValueError):
+        list(dedup_adverts(iter(ADVERTS), keep="last"))
+
+
+@pytest.mark.parametrize("keep", ["first", "last"])
+def test_dedup_compact_ids_dont_collide(keep):
+    # hash(-1) == hash(-2) in CPython, and ints and strings are different ids
+    adverts = [
+        advert(-1, "", "a"),
+        advert(-2, "", "b"),
+        advert("1", "", "c"),
+        advert(1, "", "d"),
+    ]
+    kept = dedup_adverts(adverts, keep=keep, compact=True)
+    assert copies(kept) == copies(adverts)
+
+
+def test_dedup_keep():
+    with pytest.raises(ValueError):
+        list(dedup_adverts(ADVERTS, keep="latest"))
@@ -0,0 +1,34 @@
+import pytest
+
+from ojo_local_indicators.pipeline.flatten_data import flatten_advert
+
+
+@pytest.mark.parametrize(
+    "features",
+    [None, {}, {"location": None, "salary": None, "skills": None}],
+)
+def test_flatten_advert_missing_features(features):
+    advert_row, skill_rows, salary_row = flatten_advert(
+        {"id": 7, "created": "2021-06-07", "features": features}
+    )
+    assert advert_row["id"] == "7"
+    assert advert_row["nuts_2_code"] is None
+    assert skill_rows == []
+    assert salary_row["min_annualised_salary"] is None
+
+
+def test_flatten_advert():
+    advert_row, skill_rows, salary_row = flatten_advert(
+        {
+            "id": "1",
+            "features": {
+                "location": {"nuts_2_code": "UKJ2", "nuts_2_name": "Surrey"},
+                "salary": {"min_annualised_salary": 20000.0},
+                "skills": {"skills": [{"preferred_label": "sql"}]},
+            },
+        }
+    )
+    assert advert_row["nuts_2_code"] == "UKJ2"
+    assert skill_rows[0]["advert_id"] == "1"
+    assert skill_rows[0]["preferred_label"] == "sql"
+    assert salary_row["min_annualised_salary"] == 20000.0
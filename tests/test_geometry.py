@@ -0,0 +1,97 @@
+import json
+
+import geopandas as gpd
+import pandas as pd
+import pytest
+from shapely.geometry import box
+
+from ojo_local_indicators.pipeline import geometry as geo
+
+# Two London regions side by side and one other region (British National Grid)
+REGIONS = {
+    "UKI3": ("Inner London - West", box(0, 0, 1000, 1000)),
+    "UKI4": ("Inner London - East", box(1000, 0, 2000, 1000)),
+    "UKJ2": ("Surrey, East and West Sussex", box(0, -3000, 2000, -1000)),
+}
+
+
+def write_shapefile(path, regions=REGIONS):
+    gpd.GeoDataFrame(
+        {
+            "nuts218cd": list(regions),
+            "nuts218nm": [name for name, _ in regions.values()],
+            "extra": range(len(regions)),
+        },
+        geometry=[shape for _, shape in regions.values()],
+        crs="EPSG:27700",
+    ).to_file(path)
+    return str(path)
+
+
+@pytest.fixture
+def shapefile(tmp_path, monkeypatch):
+    monkeypatch.setattr(geo, "_geometries", {})
+    return write_shapefile(tmp_path / "nuts.shp")
+
+
+def test_london_is_merged(shapefile, tmp_path):
+    nuts = geo.get_nuts_geometry(shapefile, store_dir=str(tmp_path / "store"))
+    assert list(nuts.columns) == ["Nuts 2", "Nuts 2 region", "geometry"]
+    assert sorted(nuts["Nuts 2"]) == ["UKI", "UKJ2"]
+    london = nuts.set_index("Nuts 2").loc["UKI"]
+    assert london["Nuts 2 region"] == "London"
+    assert london["geometry"].geom_type == "Polygon"
+    assert nuts.crs.to_epsg() == 4326
+    codes = pd.Series(["UKI3", "UKI7", "UKJ2"])
+    assert list(geo.merge_codes(codes)) == ["UKI", "UKI", "UKJ2"]
+
+
+def test_reads_from_the_store(shapefile, tmp_path, monkeypatch):
+    store_dir = str(tmp_path / "store")
+    built = geo.get_nuts_geometry(shapefile, "low", store_dir=store_dir)
+
+    def build(*args):
+        raise AssertionError("built again")
+
+    # From the stored files in a new session, then from memory
+    monkeypatch.setattr(geo, "build_nuts_geometry", build)
+    monkeypatch.setattr(geo, "_geometries", {})
+    for _ in range(2):
+        read = geo.get_nuts_geometry(shapefile, "low", store_dir=store_dir)
+        assert read.geom_equals(built).all()
+    read["Nuts 2"] = "changed"
+    assert "changed" not in set(
+        geo.get_nuts_geometry(shapefile, "low", store_dir=store_dir)["Nuts 2"]
+    )
+
+
+def test_geometry_key_invalidation(shapefile, tmp_path):
+    store_dir = str(tmp_path / "store")
+    key = geo.geometry_key(shapefile)
+    assert geo.geometry_key(shapefile) == key
+    merges = {"UKJ": {"name": "South East", "codes": ["UKJ2"]}}
+    assert geo.geometry_key(shapefile, merges) != key
+    geo.get_nuts_geometry(shapefile, store_dir=store_dir)
+
+    # A changed shapefile gets a new key, and is built again
+    regions = {**REGIONS, "UKJ1": ("Berkshire", box(3000, 0, 4000, 1000))}
+    write_shapefile(shapefile, regions)
+    assert geo.geometry_key(shapefile) != key
+    nuts = geo.get_nuts_geometry(shapefile, store_dir=store_dir)
+    assert sorted(nuts["Nuts 2"]) == ["UKI", "UKJ1", "UKJ2"]
+    assert len(list((tmp_path / "store").iterdir())) == 2
+
+
+def test_topojson(shapefile, tmp_path):
+    store_dir = str(tmp_path / "store")
+    path = geo.export_nuts_topojson(
+        shapefile, str(tmp_path / "maps" / "nuts_2.topo.json"), store_dir=store_dir
+    )
+    with open(path) as topo_file:
+        topology = json.load(topo_file)
+    regions = topology["objects"][geo.TOPOJSON_OBJECT]["geometries"]
+    assert sorted(region["properties"]["Nuts 2"] for region in regions) == [
+        "UKI",
+        "UKJ2",
+    ]
+    assert "transform" in topology
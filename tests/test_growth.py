@@ -0,0 +1,126 @@
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ojo_local_indicators.pipeline import growth as gr
+
+WINDOWS = [
+    ("June to August", "2021-06-01", "2021-08-31"),
+    ("September to November", "2021-09-01", None),
+]
+
+
+def days(start, end):
+    return [str(day.date()) for day in pd.date_range(start, end)]
+
+
+def regions_fixture():
+    """Adverts from 07-06-2021 to 22-11-2021 (86 and 83 days in the two
+    windows) in three regions, with September to November counts multiple of
+    83 so the old day scaling has no rounding."""
+    rng = np.random.default_rng(0)
+    jun_aug, sep_nov = days("2021-06-07", "2021-08-31"), days(
+        "2021-09-01", "2021-11-22"
+    )
+    rows = [("UKJ2", day) for day in jun_aug * 2 + sep_nov]
+    for region, n_jun_aug, n_sep_nov in [("UKI3", 86, 166), ("UKD1", 43, 249)]:
+        rows += [(region, day) for day in rng.choice(jun_aug, n_jun_aug)]
+        rows += [(region, day) for day in rng.choice(sep_nov, n_sep_nov)]
+    return pd.DataFrame(rows, columns=["location", "created"])
+
+
+def old_regions_growth(loc_uk):
+    """Percent change per region as regions_growth computed it before the
+    growth engine (a fraction, with the day counts hard coded)."""
+    created = pd.to_datetime(loc_uk["created"], format="%Y-%m-%d")
+    jun_aug = loc_uk[created <= "2021-08-31"]
+    sep_nov = loc_uk[created >= "2021-09-01"]
+    count_jun_aug = pd.Series(Counter(jun_aug["location"]))
+    count_sep_nov = (pd.Series(Counter(sep_nov["location"])) / 83 * 86).astype(int)
+    return count_sep_nov / count_jun_aug - 1
+
+
+def test_percent_change_matches_old_regions_growth():
+    loc_uk = regions_fixture()
+    growth = gr.period_growth(loc_uk, "location", WINDOWS)
+    old = old_regions_growth(loc_uk)
+    assert growth["Percent change"].to_dict() == pytest.approx((old * 100).to_dict())
+    assert growth.loc["UKJ2", "Percent change"] == pytest.approx(-50.0)
+
+
+def test_window_days_clipped_and_open_ended():
+    dates = ["2021-06-07", "2021-11-22"]
+    assert gr.window_days(dates, WINDOWS).to_dict() == {
+        "June to August": 86,
+        "September to November": 83,
+    }
+    windows = [("Before", None, "2021-06-10"), ("After", "2021-12-01", None)]
+    assert gr.window_days(dates, windows).to_dict() == {"Before": 4, "After": 0}
+
+
+def test_overlapping_windows():
+    dates = ["2021-06-07", "2021-07-15", "2021-08-20"]
+    windows = [
+        ("June to July", "2021-06-01", "2021-07-31"),
+        ("Summer", "2021-06-01", None),
+    ]
+    # An advert is in the first window it falls in, days count whole windows
+    assert list(gr.assign_windows(dates, windows)) == [
+        "June to July",
+        "June to July",
+        "Summer",
+    ]
+    assert gr.window_days(dates, windows).to_dict() == {
+        "June to July": 55,
+        "Summer": 75,
+    }
+    assert list(gr.assign_windows(["2021-05-01"], windows).isna()) == [True]
+
+
+def test_weighted_counts_match_rows():
+    loc_uk = regions_fixture()
+    counts = loc_uk.value_counts().rename("adverts").reset_index()
+    weighted = gr.period_growth(counts, "location", WINDOWS, count="adverts")
+    rows = gr.period_growth(loc_uk, "location", WINDOWS)
+    pd.testing.assert_frame_equal(
+        weighted.sort_index(), rows.sort_index(), check_index_type=False
+    )
+
+
+def test_adverts_denominators():
+    adverts = pd.DataFrame(
+        {
+            "id": [1, 2, 3, 4],
+            "created": ["2021-06-07", "2021-06-08", "2021-09-01", "2021-09-02"],
+        }
+    )
+    # Several skills per advert, and adverts without skills
+    skills = pd.DataFrame(
+        {
+            "skill": ["ICT", "Education", "ICT", "ICT"],
+            "created": ["2021-06-07", "2021-06-07", "2021-09-01", "2021-09-02"],
+        }
+    )
+    growth = gr.period_growth(skills, "skill", WINDOWS, adverts=adverts)
+    assert growth.loc["ICT", "June to August percent vacancies"] == 50.0
+    assert growth.loc["ICT", "September to November percent vacancies"] == 100.0
+    assert growth.loc["ICT", "Percent share difference"] == 50.0
+    # Days from the adverts (07-06 to 02-09), not the skills
+    assert growth.loc["ICT", "June to August per day"] == pytest.approx(1 / 86)
+    assert growth.loc["ICT", "September to November per day"] == 1.0
+
+
+def test_growth_tables_several_dimensions():
+    frame = pd.DataFrame(
+        {
+            "created": ["2021-06-07", "2021-09-01", "2021-09-02"],
+            "sector": ["IT", "IT", "Nursing"],
+            "region": ["UKJ2", "UKJ2", "UKJ1"],
+        }
+    )
+    tables = gr.growth_tables(frame, ["sector", ["region", "sector"]], WINDOWS)
+    assert tables["sector"].loc["IT", "September to November count"] == 1
+    pair = tables[("region", "sector")]
+    assert pair.loc[("UKJ1", "Nursing"), "June to August count"] == 0
@@ -0,0 +1,129 @@
+import json
+import shutil
+
+import pytest
+
+from ojo_local_indicators.getters.job_ads import local_dir_backend
+from ojo_local_indicators.pipeline import ingest as ing
+
+CACHE_DATES = ["07-06-2021", "19-07-2021", "30-08-2021", "11-10-2021"]
+
+
+def advert(advert_id, created, nuts_2_code="UKJ2"):
+    return {
+        "id": advert_id,
+        "created": created,
+        "sector": "IT",
+        "parent_sector": "Technology",
+        "features": {
+            "location": {"nuts_2_code": nuts_2_code},
+            "skills": {"skills": [{"label_cluster_0": "ICT"}]},
+        },
+    }
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Upstream windows in a folder, and a local window cache and store."""
+    upstream = tmp_path / "upstream"
+    upstream.mkdir()
+    monkeypatch.setattr(
+        ing, "get_job_ads", _with_cache_dir(ing.get_job_ads, tmp_path / "cache")
+    )
+    return upstream, tmp_path / "store"
+
+
+def _with_cache_dir(get_job_ads, cache_dir):
+    def wrapped(windows, backend, **kwargs):
+        return get_job_ads(windows, backend, cache_dir=str(cache_dir), **kwargs)
+
+    return wrapped
+
+
+def write_window(upstream, start, end, adverts):
+    (upstream / f"{start}_{end}.json").write_text(json.dumps(adverts))
+
+
+def test_cache_windows():
+    assert ing.cache_windows(CACHE_DATES[::-1]) == [
+        ("07-06-2021", "19-07-2021"),
+        ("19-07-2021", "30-08-2021"),
+        ("30-08-2021", "11-10-2021"),
+    ]
+    windows = [("19-07-2021", "30-08-2021"), ("07-06-2021", "19-07-2021")]
+    assert ing.cache_windows(windows) == windows[::-1]
+
+
+def test_get_windows():
+    assert ing.get_windows("01-09-2021", "20-11-2021", CACHE_DATES) == [
+        ("30-08-2021", "11-10-2021")
+    ]
+    assert ing.get_windows("19-07-2021", "19-07-2021", CACHE_DATES) == [
+        ("07-06-2021", "19-07-2021"),
+        ("19-07-2021", "30-08-2021"),
+    ]
+    assert ing.get_windows("12-10-2021", "20-11-2021", CACHE_DATES) == []
+
+
+def test_ingest_is_incremental(store):
+    upstream, store_dir = store
+    write_window(upstream, "07-06-2021", "19-07-2021", [advert(1, "2021-06-08")])
+    write_window(
+        upstream,
+        "19-07-2021",
+        "30-08-2021",
+        [advert(2, "2021-07-20"), advert(3, "2021-07-21")],
+    )
+    backend = local_dir_backend(str(upstream))
+    dates = CACHE_DATES[:3]
+    watermark = ing.ingest("30-08-2021", backend, str(store_dir), dates)
+    assert watermark == {"last_created": "2021-07-21", "n_adverts": 3}
+    assert ing.stored_ids(str(store_dir)) == {"1", "2", "3"}
+
+    # A late advert in the latest window (already cached) is picked up, and
+    # stored adverts (ids as ints upstream, strings in the store) are skipped
+    write_window(
+        upstream,
+        "19-07-2021",
+        "30-08-2021",
+        [advert(2, "2021-07-20"), advert(3, "2021-07-21"), advert(4, "2021-07-21")],
+    )
+    watermark = ing.ingest("30-08-2021", backend, str(store_dir), dates)
+    assert watermark == {"last_created": "2021-07-21", "n_adverts": 4}
+    adverts = ing.read_store_table("adverts", ["id"], str(store_dir))
+    assert sorted(adverts["id"]) == ["1", "2", "3", "4"]
+
+
+def test_counts_of_parts_stored_before_counts(store):
+    upstream, store_dir = store
+    write_window(upstream, "07-06-2021", "19-07-2021", [advert(1, "2021-06-08")])
+    write_window(upstream, "19-07-2021", "30-08-2021", [advert(2, "2021-07-20")])
+    backend = local_dir_backend(str(upstream))
+    dates = CACHE_DATES[:3]
+    ing.ingest("30-08-2021", backend, str(store_dir), dates)
+    # A store ingested before the daily counts were kept
+    shutil.rmtree(store_dir / "daily_counts")
+
+    # The next run counts the stored parts before adding its own
+    write_window(
+        upstream,
+        "19-07-2021",
+        "30-08-2021",
+        [advert(2, "2021-07-20"), advert(3, "2021-07-21", "UKJ1")],
+    )
+    ing.ingest("30-08-2021", backend, str(store_dir), dates)
+    assert ing.backfill_daily_counts(str(store_dir)) == []
+    cube = ing.read_count_cube(store_dir=str(store_dir))
+    assert cube.counts() == 3
+    assert cube.counts(by=["nuts_2_code"]).to_dict() == {"UKJ1": 1, "UKJ2": 2}
+    assert cube.counts(skill_cluster="ICT") == 3
+
+
+def test_read_count_cube_backfills_once(store):
+    upstream, store_dir = store
+    write_window(upstream, "07-06-2021", "19-07-2021", [advert(1, "2021-06-08")])
+    backend = local_dir_backend(str(upstream))
+    ing.ingest("19-07-2021", backend, str(store_dir), CACHE_DATES[:2])
+    shutil.rmtree(store_dir / "daily_counts")
+    assert ing.read_count_cube(store_dir=str(store_dir)).counts() == 1
+    assert ing.read_count_cube(store_dir=str(store_dir)).counts() == 1
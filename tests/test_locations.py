@@ -0,0 +1,38 @@
+import copy
+
+import pytest
+
+from ojo_local_indicators.pipeline.locations import (
+    apply_location_fixes,
+    get_nuts_2_names,
+    relabel_nuts,
+)
+from ojo_local_indicators.pipeline.records import to_job_ads
+
+ADVERTS = [
+    {"id": "1", "job_location_raw": "Brighton", "features": None},
+    {"id": "2", "job_location_raw": "Brighton", "features": {"location": None}},
+    {"id": "3", "job_location_raw": "Brighton"},
+    {
+        "id": "4",
+        "job_location_raw": "Brighton",
+        "features": {"location": {"nuts_2_code": "UKJ1", "nuts_2_name": "Berkshire"}},
+    },
+]
+
+
+@pytest.mark.parametrize("as_job_ads", [False, True])
+def test_missing_features_or_location(as_job_ads):
+    data = to_job_ads(ADVERTS) if as_job_ads else copy.deepcopy(ADVERTS)
+    assert get_nuts_2_names(data) == {"UKJ1": "Berkshire"}
+    touched = apply_location_fixes(data, {"Brighton": ("UKJ2", "Sussex")})
+    assert touched == {"Brighton": 1}
+    assert get_nuts_2_names(data) == {"UKJ2": "Sussex"}
+
+
+@pytest.mark.parametrize("as_job_ads", [False, True])
+def test_relabel_nuts_missing_features_or_location(as_job_ads):
+    data = to_job_ads(ADVERTS) if as_job_ads else copy.deepcopy(ADVERTS)
+    relabel_nuts(data, "UKJ2", "Sussex")
+    assert get_nuts_2_names(data) == {"UKJ2": "Sussex"}
+    assert data[1]["features"].get("location") is None
@@ -0,0 +1,49 @@
+import json
+from functools import partial
+
+import pandas as pd
+import pytest
+from test_geometry import write_shapefile
+
+from ojo_local_indicators.pipeline import geometry as geo
+from ojo_local_indicators.pipeline import maps
+
+
+def test_map_file_name():
+    assert maps.map_file_name("Percent change (%)") == "percent_change"
+
+
+def test_same_file_names_fail(tmp_path):
+    indicators = pd.DataFrame(
+        {"Nuts 2": ["UKI"], "Percent change": [1.0], "percent_change": [2.0]}
+    )
+    with pytest.raises(ValueError, match="percent_change"):
+        maps.render_maps(indicators, "missing.shp", str(tmp_path / "maps"))
+    assert not (tmp_path / "maps").exists()
+
+
+def test_render_html_maps(tmp_path, monkeypatch):
+    monkeypatch.setattr(geo, "_geometries", {})
+    store_dir = str(tmp_path / "store")
+    for name in ("get_nuts_geometry", "export_nuts_topojson"):
+        function = getattr(maps, name)
+        monkeypatch.setattr(maps, name, partial(function, store_dir=store_dir))
+    shapefile = write_shapefile(tmp_path / "nuts.shp")
+    indicators = pd.DataFrame(
+        {
+            "Nuts 2": geo.merge_codes(pd.Series(["UKI3", "UKJ2"])),
+            "Percent change": [-12.5, 4.0],
+            "Share (pp)": [1.0, -1.0],
+        }
+    )
+    out_dir = tmp_path / "maps"
+    manifest = maps.render_maps(indicators, shapefile, str(out_dir), max_workers=1)
+    assert list(manifest["path"]) == [
+        str(out_dir / "percent_change.html"),
+        str(out_dir / "share_pp.html"),
+    ]
+    assert (out_dir / maps.TOPOJSON_FILE).exists()
+    with open(out_dir / "manifest.json") as manifest_file:
+        assert len(json.load(manifest_file)) == 2
+    html = (out_dir / "share_pp.html").read_text()
+    assert maps.TOPOJSON_FILE in html and "Percent change" not in html
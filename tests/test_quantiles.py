@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from ojo_local_indicators.pipeline.quantiles import SalarySketch
+
+QUANTILES = [0, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 1]
+
+
+def random_salaries(seed, n):
+    """Log-normal salaries (around £30k, from a few pounds to millions), some
+    repeated and a few zero."""
+    rng = np.random.default_rng(seed)
+    salaries = rng.lognormal(np.log(30000), 1.5, n).round(2)
+    salaries[rng.random(n) < 0.2] = 25000.0
+    salaries[rng.random(n) < 0.01] = 0.0
+    return salaries
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("relative_accuracy", [0.01, 0.05])
+@pytest.mark.parametrize("n", [1, 2, 11, 1000])
+def test_quantiles_within_relative_accuracy(seed, relative_accuracy, n):
+    salaries = random_salaries(seed, n)
+    sketch = SalarySketch(relative_accuracy).update(salaries)
+    assert len(sketch) == n
+    for q in QUANTILES:
+        exact = np.quantile(salaries, q)
+        assert abs(sketch.quantile(q) - exact) <= relative_accuracy * exact + 1e-9
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_merge_equals_sketch_of_concatenation(seed):
+    salaries = random_salaries(seed, 1000)
+    parts = np.array_split(salaries, [10, 400, 400, 900])
+    merged = SalarySketch()
+    for part in parts:
+        merged.merge(SalarySketch().update(part))
+    single = SalarySketch().update(salaries)
+    assert merged.bins == single.bins
+    assert (merged.zero_count, merged.count) == (single.zero_count, single.count)
+    assert [merged.quantile(q) for q in QUANTILES] == [
+        single.quantile(q) for q in QUANTILES
+    ]
+
+
+def test_merge_needs_the_same_accuracy():
+    sketch = SalarySketch(0.01).update([1.0])
+    with pytest.raises(ValueError):
+        sketch.merge(SalarySketch(0.02).update([2.0]))
+    assert sketch.count == 1
+
+
+def test_empty_sketch():
+    sketch = SalarySketch()
+    assert not sketch
+    assert sketch.median() is None
@@ -0,0 +1,112 @@
+import pytest
+
+from ojo_local_indicators.pipeline.clean_data import create_df, remove_cols
+from ojo_local_indicators.pipeline.locations import (
+    apply_location_fixes,
+    relabel_nuts,
+)
+from ojo_local_indicators.pipeline.records import JobAd, to_job_ads
+
+RAW_ADVERT = {
+    "__version__": "1",
+    "data_source": "Reed",
+    "id": "1",
+    "created": "2021-06-07",
+    "job_title_raw": "Data engineer",
+    "job_location_raw": "Brighton",
+    "company_raw": "Acme",
+    "sector": "IT",
+    "parent_sector": "Technology",
+    "raw_salary": None,
+    "raw_min_salary": 20000.0,
+    "raw_max_salary": 30000.0,
+    "raw_salary_unit": "YEAR",
+    "raw_salary_currency": "GBP",
+    "features": {
+        "is_duplicate": False,
+        "location": {"nuts_2_code": "UKJ1", "nuts_2_name": "Berkshire"},
+        "salary": {"min_annualised_salary": 20000.0, "max_annualised_salary": 30000.0},
+        "skills": {
+            "skills": [
+                {"preferred_label": "sql", "label_cluster_0": "ICT"},
+                {"preferred_label": "python", "surface_form": "Python"},
+            ]
+        },
+    },
+}
+
+
+def kept(advert):
+    """Raw advert without the fields job ads don't keep."""
+    return {k: v for k, v in advert.items() if k not in ("__version__", "data_source")}
+
+
+def test_to_ojo_round_trip():
+    job_ad = JobAd.from_ojo(RAW_ADVERT)
+    assert job_ad.to_ojo() == kept(RAW_ADVERT)
+    assert JobAd.from_ojo(job_ad.to_ojo()).to_ojo() == kept(RAW_ADVERT)
+
+
+@pytest.mark.parametrize(
+    "features",
+    [
+        {},
+        {"location": None, "skills": {"skills": None}},
+        {"location": {}, "is_duplicate": True},
+    ],
+)
+def test_to_ojo_round_trip_missing_features(features):
+    advert = {"id": "2", "features": features}
+    expected = {k: v for k, v in features.items() if v is not None}
+    assert JobAd.from_ojo(advert).to_ojo() == {"id": "2", "features": expected}
+
+
+def test_features_reads_like_raw_advert():
+    job_ad = JobAd.from_ojo(RAW_ADVERT)
+    features = job_ad["features"]
+    assert features["location"] == RAW_ADVERT["features"]["location"]
+    assert features.get("salary") == RAW_ADVERT["features"]["salary"]
+    assert "location" in features and "missing" not in features
+    assert features["skills"]["skills"][0]["preferred_label"] == "sql"
+
+
+def test_location_fixes_are_kept():
+    job_ads = to_job_ads([RAW_ADVERT, {"id": "2", "features": {}}])
+    touched = apply_location_fixes(job_ads, {"Brighton": ("UKJ2", "Sussex")})
+    assert touched == {"Brighton": 1}
+    assert job_ads[0]["features"]["location"] == {
+        "nuts_2_code": "UKJ2",
+        "nuts_2_name": "Sussex",
+    }
+    assert job_ads[0].to_ojo()["features"]["location"]["nuts_2_code"] == "UKJ2"
+    assert "location" not in job_ads[1]["features"]
+
+
+def test_relabel_nuts_is_kept():
+    job_ads = relabel_nuts(to_job_ads([RAW_ADVERT]), "UKI", "London")
+    assert create_df(job_ads)["nuts_2_code"].tolist() == ["UKI"]
+
+
+def test_feature_writes():
+    job_ad = JobAd.from_ojo(RAW_ADVERT)
+    job_ad["features"]["is_duplicate"] = True
+    job_ad["features"]["salary"] = {"min_annualised_salary": 1.0}
+    assert job_ad.to_ojo()["features"]["is_duplicate"] is True
+    assert job_ad.to_ojo()["features"]["salary"] == {"min_annualised_salary": 1.0}
+    del job_ad["features"]["location"]
+    assert "location" not in job_ad["features"]
+    # Fields job ads don't keep can't be written
+    with pytest.raises(KeyError):
+        job_ad["features"]["location"]["nuts_3_code"] = "UKJ21"
+    with pytest.raises(KeyError):
+        job_ad["features"]["skills"] = {"skills": []}
+    with pytest.raises(TypeError):
+        job_ad["sector"] = "Finance"
+
+
+def test_create_df_remove_cols_with_job_ads():
+    for data in ([RAW_ADVERT], to_job_ads([RAW_ADVERT])):
+        df = create_df(data)
+        remove_cols(df)
+        assert "features" not in df.columns
+        assert df.loc[0, "nuts_2_code"] == "UKJ1"
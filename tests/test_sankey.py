@@ -0,0 +1,128 @@
+import json
+
+import numpy as np
+
+from ojo_local_indicators.analysis.utils import clean_titles
+from ojo_local_indicators.pipeline.sankey import (
+    count_titles_skills,
+    sankey_data,
+    top_titles,
+)
+
+BROAD_SKILLS = ["Education", "Healthcare", "Transversal skills"]
+EXCLUDED_TERMS = ["part", "time"]
+TITLES = ["Nurse", "nurse - part time", "Teacher", "Cook", "Care Assistant", "Cleaner"]
+
+
+def random_adverts(seed, n=300):
+    """Adverts with random titles, duplicate flags and skills (the first
+    skill of each advert in the taxonomy, the others maybe not)."""
+    rng = np.random.default_rng(seed)
+    adverts = []
+    for _ in range(n):
+        skills = [
+            {
+                "label_cluster_0": BROAD_SKILLS[rng.integers(len(BROAD_SKILLS))],
+                "label_cluster_2": "narrow" if i == 0 or rng.random() < 0.7 else None,
+            }
+            for i in range(rng.integers(1, 5))
+        ]
+        if rng.random() < 0.2:
+            skills.append({"label_cluster_0": None, "label_cluster_2": None})
+        features = {"is_duplicate": bool(rng.random() < 0.1)}
+        if rng.random() < 0.9:
+            features["skills"] = {"skills": skills}
+        adverts.append(
+            {"job_title_raw": TITLES[rng.integers(len(TITLES))], "features": features}
+        )
+    return adverts
+
+
+def baseline_sankey(adverts, no_job_titles):
+    """Sankey data as the occupations script built it before the single pass
+    builder (one pass per group, stable sort of the titles)."""
+    all_job_titles = {group: {} for group in BROAD_SKILLS + ["All"]}
+    for one_advert in adverts:
+        features = one_advert["features"]
+        if features["is_duplicate"] == False and "skills" in features:
+            job_title = clean_titles(one_advert["job_title_raw"], EXCLUDED_TERMS)
+            for one_skill in features["skills"]["skills"]:
+                group = one_skill["label_cluster_0"]
+                if group is not None:
+                    for key in (group, "All"):
+                        all_job_titles[key][job_title] = (
+                            all_job_titles[key].get(job_title, 0) + 1
+                        )
+    top = {
+        group: [
+            title
+            for title, _ in sorted(counts.items(), key=lambda k: k[1], reverse=True)
+        ][:no_job_titles]
+        for group, counts in all_job_titles.items()
+    }
+    nodes, links = [], []
+    for group, titles in top.items():
+        skills = {title: {} for title in titles}
+        for one_advert in adverts:
+            features = one_advert["features"]
+            if features["is_duplicate"] == False and "skills" in features:
+                job_title = clean_titles(one_advert["job_title_raw"], EXCLUDED_TERMS)
+                if job_title in skills:
+                    for one_skill in features["skills"]["skills"]:
+                        if one_skill["label_cluster_2"] is not None:
+                            broad = one_skill["label_cluster_0"]
+                            skills[job_title][broad] = (
+                                skills[job_title].get(broad, 0) + 1
+                            )
+        for title, counts in skills.items():
+            name = title.title() + " " + group
+            nodes.append(
+                {"name": name, "actual_name": title.title(), "category": group}
+            )
+            total = sum(counts.values())
+            links.extend(
+                {
+                    "source": name,
+                    "target": broad,
+                    "value": round(100 * count / total, 2),
+                    "category": group,
+                }
+                for broad, count in counts.items()
+            )
+    nodes_skills = [{"name": value, "category": "Skill"} for value in BROAD_SKILLS]
+    return {"nodes": nodes[::-1] + nodes_skills, "links": links}
+
+
+def sankey(adverts, no_job_titles):
+    title_counts, title_skills = count_titles_skills(
+        adverts, BROAD_SKILLS, EXCLUDED_TERMS
+    )
+    return sankey_data(
+        top_titles(title_counts, no_job_titles), title_skills, BROAD_SKILLS
+    )
+
+
+def test_sankey_matches_baseline():
+    for seed in range(10):
+        adverts = random_adverts(seed)
+        for no_job_titles in (2, 4, 12):
+            assert json.dumps(sankey(adverts, no_job_titles)) == json.dumps(
+                baseline_sankey(adverts, no_job_titles)
+            )
+
+
+def test_links_are_shares_of_mentions():
+    skills = [
+        {"label_cluster_0": "Healthcare", "label_cluster_2": "narrow"},
+        {"label_cluster_0": "Healthcare", "label_cluster_2": "narrow"},
+        {"label_cluster_0": "Education", "label_cluster_2": "narrow"},
+    ]
+    advert = {
+        "job_title_raw": "Nurse",
+        "features": {"is_duplicate": False, "skills": {"skills": skills}},
+    }
+    links = sankey([advert], 1)["links"]
+    assert [link["value"] for link in links if link["category"] == "All"] == [
+        66.67,
+        33.33,
+    ]
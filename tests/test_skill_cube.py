@@ -0,0 +1,67 @@
+import pandas as pd
+
+from ojo_local_indicators.pipeline import skill_cube as sc
+
+
+def advert(advert_id, created, clusters, title="Nurse", nuts_2_code="UKJ2"):
+    return {
+        "id": advert_id,
+        "created": created,
+        "job_title_raw": title,
+        "sector": "Nursing",
+        "features": {
+            "is_duplicate": False,
+            "location": {"nuts_2_code": nuts_2_code},
+            "skills": {
+                "skills": [
+                    {
+                        "preferred_label": label,
+                        "label_cluster_0": cluster,
+                        "label_cluster_1": cluster,
+                        "label_cluster_2": cluster,
+                    }
+                    for cluster, label in clusters
+                ]
+            },
+        },
+    }
+
+
+ADVERTS = [
+    advert(1, "2021-06-07T10:00:00", [("Health", "care"), ("Health", "triage")]),
+    advert(2, "2021-06-07", [("Health", "care"), ("ICT", "sql")]),
+    advert(3, "2021-06-08", [], nuts_2_code="UKJ1"),
+]
+
+
+def test_rollup_counts_adverts():
+    cube = sc.build_skill_cube_from_adverts(ADVERTS)
+    assert sc.rollup(cube, sc.ALL_ADVERTS).to_dict() == {sc.ALL_ADVERTS: 3}
+    assert sc.rollup(cube, "label_cluster_0").to_dict() == {"Health": 2, "ICT": 1}
+    assert (
+        sc.rollup(cube, "preferred_label", end="2021-06-07", label=["care", "sql"])[
+            "care"
+        ]
+        == 2
+    )
+    by_region = sc.rollup(cube, sc.ALL_ADVERTS, by=("nuts_2_code",))
+    assert by_region.to_dict() == {"UKJ2": 2, "UKJ1": 1}
+    assert cube["date"].dt.strftime("%Y-%m-%d").min() == "2021-06-07"
+
+
+def test_repeated_ids_are_counted_once():
+    cube = sc.build_skill_cube_from_adverts(ADVERTS + [ADVERTS[0]])
+    assert sc.rollup(cube, sc.ALL_ADVERTS).sum() == 3
+    assert sc.rollup(cube, "preferred_label")["care"] == 2
+    assert sc.rollup(cube, "preferred_label")["triage"] == 1
+
+
+def test_other_dimensions_and_levels():
+    adverts = pd.DataFrame({"id": ["1", "2"], "job_title": ["nurse", "cook"]})
+    skills = pd.DataFrame(
+        {"advert_id": ["1", "1", "2"], "label_cluster_0": ["Health", "ICT", None]}
+    )
+    cube = sc.build_skill_cube(adverts, skills, ["job_title"], ["label_cluster_0"])
+    assert set(cube["level"]) == {sc.ALL_ADVERTS, "label_cluster_0"}
+    counts = sc.rollup(cube, "label_cluster_0", by=("label", "job_title"))
+    assert counts.to_dict() == {("Health", "nurse"): 1, ("ICT", "nurse"): 1}
@@ -0,0 +1,50 @@
+import pytest
+
+from ojo_local_indicators.pipeline.skills import aggregate_skills, cluster_skills
+
+
+def advert(unit, salary, skills):
+    return {
+        "company_raw": "Acme",
+        "raw_salary": salary,
+        "raw_min_salary": None,
+        "raw_max_salary": None,
+        "raw_salary_unit": unit,
+        "raw_salary_currency": "GBP",
+        "features": {
+            "skills": {
+                "skills": [
+                    {
+                        "preferred_label": label,
+                        "label_cluster_0": cluster,
+                        "label_cluster_2": cluster,
+                    }
+                    for label, cluster in skills
+                ]
+            }
+        },
+    }
+
+
+def test_aggregate_skills():
+    adverts = [
+        advert("YEAR", 30000.0, [("sql", "ICT"), ("teamwork", "Transversal")]),
+        advert("DAY", 100.0, [("sql", "ICT")]),
+        # Unknown salary unit: counted, without a salary
+        advert("WEEK", 500.0, [("sql", "ICT"), ("welding", "Engineering")]),
+        {"company_raw": "Acme", "features": {}},
+    ]
+    aggregates = aggregate_skills(adverts)
+    ict = cluster_skills(aggregates, "label_cluster_0", "ICT")
+    assert ict["sql"]["skill_count"] == 3
+    assert ict["sql"]["min_salaries"].count == 2
+    assert ict["sql"]["min_salaries"].median() == pytest.approx(28000.0, rel=0.01)
+    engineering = cluster_skills(aggregates, "label_cluster_2", ["Engineering"])
+    assert engineering["welding"]["skill_count"] == 1
+    assert not engineering["welding"]["min_salaries"]
+
+
+def test_aggregate_skills_exclude():
+    adverts = [advert("YEAR", 30000.0, [("sql", "ICT")])]
+    aggregates = aggregate_skills(adverts, exclude={"company_raw": ["Acme"]})
+    assert cluster_skills(aggregates, "label_cluster_0", "ICT") == {}
@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+from ojo_local_indicators.getters.stream_data import (
+    iter_adverts,
+    iter_batches,
+    project_fields,
+)
+
+ADVERTS = [
+    {
+        "id": "1",
+        "created": "2021-06-07",
+        "job_title_raw": 'Data "engineer" [remote], {hybrid}',
+        "features": {"location": {"nuts_2_code": "UKJ2"}, "skills": []},
+    },
+    {"id": "2", "created": "2021-06-08", "features": {"location": None}},
+    {"id": "3", "created": "2021-06-09", "salary": 1.5e4},
+]
+
+
+def write_array(path, adverts, leading="", indent=None):
+    path.write_text(leading + json.dumps(adverts, indent=indent))
+    return path
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, 1 << 20])
+@pytest.mark.parametrize("leading", ["", " ", "\n\n   \t\n", " " * 20])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_iter_adverts_array(tmp_path, chunk_size, leading, indent):
+    path = write_array(tmp_path / "adverts.json", ADVERTS, leading, indent)
+    assert list(iter_adverts(path, chunk_size=chunk_size)) == ADVERTS
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 1 << 20])
+@pytest.mark.parametrize("content", ["[]", "  [ ]  ", "\n[\n]\n", "", "   "])
+def test_iter_adverts_empty(tmp_path, chunk_size, content):
+    path = tmp_path / "adverts.json"
+    path.write_text(content)
+    assert list(iter_adverts(path, chunk_size=chunk_size)) == []
+
+
+def test_iter_adverts_json_lines(tmp_path):
+    path = tmp_path / "adverts.jsonl"
+    path.write_text("\n" + "\n\n".join(json.dumps(advert) for advert in ADVERTS))
+    assert list(iter_adverts(path)) == ADVERTS
+
+
+def test_iter_adverts_truncated_array(tmp_path):
+    path = tmp_path / "adverts.json"
+    path.write_text(json.dumps(ADVERTS)[:-30])
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_adverts(path, chunk_size=8))
+
+
+def test_iter_adverts_fields(tmp_path):
+    path = write_array(tmp_path / "adverts.json", ADVERTS)
+    assert list(iter_adverts(path, fields=["id", "features.location.nuts_2_code"])) == [
+        {"id": "1", "features": {"location": {"nuts_2_code": "UKJ2"}}},
+        {"id": "2"},
+        {"id": "3"},
+    ]
+
+
+def test_project_fields_missing_paths():
+    advert = {"id": "1", "features": {"location": None, "skills": []}}
+    assert project_fields(advert, ["features.location.nuts_2_code"]) == {}
+    assert project_fields(advert, ["features.salary.min", "missing.key"]) == {}
+    assert project_fields(advert, ["features.location"]) == {
+        "features": {"location": None}
+    }
+    assert project_fields(advert, ["id", "features.skills"]) == {
+        "id": "1",
+        "features": {"skills": []},
+    }
+
+
+def test_iter_batches(tmp_path):
+    path = write_array(tmp_path / "adverts.json", ADVERTS * 3)
+    batches = list(iter_batches(path, batch_size=4))
+    assert [len(batch) for batch in batches] == [4, 4, 1]
+    assert sum(batches, []) == ADVERTS * 3
@@ -0,0 +1,27 @@
+import pandas as pd
+
+from ojo_local_indicators.pipeline import sussex_spotlight as ss
+
+SKILLS = [
+    [{"label_cluster_2": "Nursing"}, {"label_cluster_2": "Nursing"}],
+    None,
+    [{"label_cluster_2": "Teaching"}, {"label_cluster_2": "Nursing"}],
+    [{"label_cluster_2": None}],
+]
+
+
+def test_locations_skills_df_inputs():
+    area = list(range(len(SKILLS)))
+    per_advert = ss.skill_count(SKILLS, "label_cluster_2")
+    expected = pd.DataFrame(
+        {"Skill": ["Nursing", "Teaching"], "Adverts requiring skill group": [0.5, 0.25]}
+    )
+    for cluster in (per_advert, ss.presence_counts(SKILLS, "label_cluster_2")):
+        df = ss.locations_skills_df(area, cluster).reset_index(drop=True)
+        pd.testing.assert_frame_equal(df, expected)
+
+
+def test_presence_counts_matches_combine():
+    per_advert = ss.skill_count(SKILLS, "label_cluster_2")
+    combined = {k: sum(v) for k, v in ss.combine(per_advert).items()}
+    assert dict(ss.presence_counts(SKILLS, "label_cluster_2")) == combined
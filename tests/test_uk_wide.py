@@ -0,0 +1,60 @@
+import json
+
+import geopandas as gpd
+from shapely.geometry import box
+
+from ojo_local_indicators.pipeline.geometry import TOPOJSON_OBJECT
+from ojo_local_indicators.pipeline.uk_wide import create_nuts_map_divergent
+
+VALUES = gpd.GeoDataFrame(
+    {
+        "Nuts 2": ["UKI", "UKJ2"],
+        "Nuts 2 region": ["London", "Surrey, East and West Sussex"],
+        "Percent change": [-12.5, 4.0],
+        "Other indicator": [1.0, 2.0],
+    },
+    geometry=[box(0, 0, 1, 1), box(0, 1, 1, 2)],
+    crs="EPSG:4326",
+)
+
+
+def map_spec(df, topojson_url=None):
+    chart = create_nuts_map_divergent(
+        df,
+        "Percent change",
+        "Nuts 2 region",
+        ["#18A48C", "white", "#9A1BBE"],
+        -12.5,
+        4.0,
+        "descending",
+        0,
+        topojson_url=topojson_url,
+    )
+    return chart.to_dict()
+
+
+def test_topojson_map_embeds_only_values():
+    spec = map_spec(VALUES, topojson_url="nuts_2.topo.json")
+    assert spec["data"] == {
+        "url": "nuts_2.topo.json",
+        "format": {"type": "topojson", "feature": TOPOJSON_OBJECT},
+    }
+    (values,) = spec["datasets"].values()
+    assert values == [
+        {"Nuts 2": "UKI", "Percent change": -12.5, "Nuts 2 region": "London"},
+        {
+            "Nuts 2": "UKJ2",
+            "Percent change": 4.0,
+            "Nuts 2 region": "Surrey, East and West Sussex",
+        },
+    ]
+    (lookup,) = spec["transform"]
+    assert lookup["lookup"] == "properties.Nuts 2"
+    assert "geometry" not in json.dumps(spec)
+    assert "Other indicator" not in json.dumps(spec)
+
+
+def test_map_without_topojson_embeds_geometry():
+    spec = map_spec(VALUES)
+    (features,) = spec["datasets"].values()
+    assert len(features) == 2 and "geometry" in features[0]
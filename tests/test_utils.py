@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ojo_local_indicators.analysis.utils import (
+    TitleNormaliser,
+    annualises_salaries,
+    annualises_salary,
+)
+
+CURRENCIES = ["GBP", "GBP", "USD", "EUR", None]
+UNITS = ["YEAR", "DAY", "HOUR", "WEEK", "MONTH", None]
+
+
+def random_adverts(seed, n=500):
+    """Adverts with random salary fields: currency, unit, and either a single
+    salary, a min and max salary, or none."""
+    rng = np.random.default_rng(seed)
+    adverts = []
+    for _ in range(n):
+        salary = round(float(rng.uniform(0, 100000)), 2)
+        given = rng.choice(["single", "range", "both", "none"])
+        adverts.append(
+            {
+                "raw_salary_currency": CURRENCIES[rng.integers(len(CURRENCIES))],
+                "raw_salary_unit": UNITS[rng.integers(len(UNITS))],
+                "raw_salary": salary if given in ("single", "both") else None,
+                "raw_min_salary": salary / 2 if given in ("range", "both") else None,
+                "raw_max_salary": salary * 2 if given in ("range", "both") else None,
+            }
+        )
+    return adverts
+
+
+def scalar_salaries(one_job):
+    """annualises_salary as floats (NaN for None)."""
+    salaries = annualises_salary(one_job)
+    return [np.nan if salary is None else salary for salary in salaries]
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("as_frame", [False, True])
+def test_annualises_salaries_matches_scalar(seed, as_frame):
+    adverts = random_adverts(seed)
+    expected = np.array([scalar_salaries(one_job) for one_job in adverts])
+    columns = [
+        "raw_salary",
+        "raw_min_salary",
+        "raw_max_salary",
+        "raw_salary_unit",
+        "raw_salary_currency",
+    ]
+    if as_frame:
+        df = pd.DataFrame(adverts, columns=columns)
+        values = [df[column] for column in columns]
+    else:
+        values = [[one_job[column] for one_job in adverts] for column in columns]
+    min_salary, max_salary = annualises_salaries(*values)
+    np.testing.assert_array_equal(min_salary, expected[:, 0])
+    np.testing.assert_array_equal(max_salary, expected[:, 1])
+
+
+def test_annualises_salary_unknown_unit():
+    one_job = {
+        "raw_salary_currency": "GBP",
+        "raw_salary_unit": "WEEK",
+        "raw_salary": 500.0,
+        "raw_min_salary": None,
+        "raw_max_salary": None,
+    }
+    # Unknown units are left out, in both
+    assert annualises_salary(one_job) == [None, None]
+    min_salary, max_salary = annualises_salaries(
+        [500.0], [None], [None], ["WEEK"], ["GBP"]
+    )
+    assert np.isnan(min_salary[0]) and np.isnan(max_salary[0])
+
+
+@pytest.mark.parametrize("as_series", [False, True])
+def test_title_normaliser_batch_missing_titles(as_series):
+    titles = ["Nurse - Part Time", None, np.nan, "nurse/part time", "Cook"]
+    normalise = TitleNormaliser(["part", "time"])
+    cleaned = normalise.batch(pd.Series(titles) if as_series else titles)
+    assert list(cleaned) == ["nurse", None, None, "nurse", "cook"]
+    assert normalise.misses == 3